@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -28,9 +29,37 @@ class Settings:
             "SCAN_IGNORE_DIRS",
             ".git,.conda,node_modules,.venv,.polycache,.cache,.mypy_cache,.pytest_cache",
         ).split(",")
+        self.SCAN_GITIGNORE: bool = os.getenv("SCAN_GITIGNORE", "true").lower() == "true"
+        self.SCAN_IGNORE_FILE: str = os.getenv("SCAN_IGNORE_FILE", ".codeboxignore")
         self.SCAN_MAX_DEPTH: int = int(os.getenv("SCAN_MAX_DEPTH", "12"))
         self.SCAN_HASH: bool = os.getenv("SCAN_HASH", "false").lower() == "true"
         self.SCAN_HASH_MAX_BYTES: int = int(os.getenv("SCAN_HASH_MAX_BYTES", "1048576"))
+        self.SCAN_PARALLEL: bool = os.getenv("SCAN_PARALLEL", "false").lower() == "true"
+        self.SCAN_WORKERS: int = int(os.getenv("SCAN_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+        self.SCAN_BATCH_SIZE: int = int(os.getenv("SCAN_BATCH_SIZE", "512"))
+        self.SCAN_GIT_INDEX: bool = os.getenv("SCAN_GIT_INDEX", "false").lower() == "true"
+        self.SCAN_WRITE_CHUNK: int = int(os.getenv("SCAN_WRITE_CHUNK", "500"))
+        self.SCAN_WATCH: bool = os.getenv("SCAN_WATCH", "false").lower() == "true"
+        self.SCAN_WATCH_BACKEND: str = os.getenv("SCAN_WATCH_BACKEND", "auto")  # auto|watchdog|poll
+        self.SCAN_WATCH_DEBOUNCE_MS: int = int(os.getenv("SCAN_WATCH_DEBOUNCE_MS", "300"))
+        self.SCAN_WATCH_POLL_SECONDS: float = float(os.getenv("SCAN_WATCH_POLL_SECONDS", "2"))
+
+        # Dependency inference
+        self.DEPS_PARALLEL: bool = os.getenv("DEPS_PARALLEL", "false").lower() == "true"
+        self.DEPS_WORKERS: int = int(os.getenv("DEPS_WORKERS", str(os.cpu_count() or 1)))
+        self.DEPS_CHUNK_SIZE: int = int(os.getenv("DEPS_CHUNK_SIZE", "32"))
+        self.DEPS_PARALLEL_MIN_FILES: int = int(os.getenv("DEPS_PARALLEL_MIN_FILES", "64"))
+        # JS/TS 只扫描文件头部的 import 区（遇到第一条普通顶层语句即停止，函数体内的 import()/require 不再识别）
+        self.DEPS_JS_HEADER_ONLY: bool = os.getenv("DEPS_JS_HEADER_ONLY", "false").lower() == "true"
+
+        # Graph snapshot cache（GET /graph 的序列化结果，按项目图版本缓存）
+        # memory：进程内 LRU；file：GRAPH_CACHE_DIR 下的文件，多个 uvicorn worker 共享（Linux 可指向 /dev/shm）；off：关闭
+        self.GRAPH_CACHE_BACKEND: str = os.getenv("GRAPH_CACHE_BACKEND", "memory")
+        self.GRAPH_CACHE_MAX_BYTES: int = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.GRAPH_CACHE_DIR: str = os.getenv("GRAPH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "codebox-graph-cache"))
+
+        # graph_change_log 保留的版本数（GET /graph/delta 的 since 早于此范围时返回 410）
+        self.GRAPH_CHANGE_RETAIN_VERSIONS: int = int(os.getenv("GRAPH_CHANGE_RETAIN_VERSIONS", "1000"))
 
         # PolyAgent
         self.AUTO_SERVE_SESSION_UI: bool = os.getenv("AUTO_SERVE_SESSION_UI", "false").lower() == "true"
@@ -2,7 +2,12 @@ from .project import Project
 from .feature import Feature
 from .edge import Edge
 from .file import File
+from .file_fingerprint import FileFingerprint
+from .file_import import FileImport
+from .file_edge import FileEdge
 from .feature_detail import FeatureDetail
+from .feature_file import FeatureFile
+from .graph_change import GraphChange
 from .task import Task
 from .session_run import SessionRun
 
@@ -11,7 +16,12 @@ __all__ = [
     "Feature",
     "Edge",
     "File",
+    "FileFingerprint",
+    "FileImport",
+    "FileEdge",
     "FeatureDetail",
+    "FeatureFile",
+    "GraphChange",
     "Task",
     "SessionRun",
 ]
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class FeatureFile(Base):
+    __tablename__ = "feature_files"
+    __table_args__ = (
+        # 文件 → 功能（变更影响查询）与功能 → 文件（按功能整体替换）两个方向的索引
+        Index("idx_feature_files_project_path", "project_id", "path", mysql_length={"path": 255}),
+        Index("idx_feature_files_project_feature", "project_id", "feature_id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, nullable=False)
+    str_id = Column(String(44), nullable=True)
+    is_deleted = Column(Integer, nullable=False, default=0)
+    create_user_id = Column(BigInteger, nullable=False)
+    create_time = Column(DateTime, nullable=False, server_default=func.now())
+    update_user_id = Column(BigInteger, nullable=True)
+    update_time = Column(DateTime, nullable=True, server_default=func.now(), onupdate=func.now())
+    data_user_id = Column(BigInteger, nullable=True)
+    data_dept_id = Column(BigInteger, nullable=True)
+
+    project_id = Column(BigInteger, nullable=False)
+    feature_id = Column(BigInteger, nullable=False)
+    # 归一化的工作区相对路径（与 files.path 一致）
+    path = Column(String(1024), nullable=False)
+    role = Column(String(64), nullable=True)
+    rw = Column(String(4), nullable=True)
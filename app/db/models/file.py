@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, Integer, String, DateTime
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 
 from app.db.base import Base
@@ -6,6 +6,19 @@ from app.db.base import Base
 
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        # 扫描按批次以 path IN (...) 查现有索引；MySQL 需前缀长度
+        Index("idx_files_project_path", "project_id", "path", mysql_length={"path": 255}),
+        # 按父目录列表的键集分页：WHERE parent_path=? AND (is_dir, path) 越过游标
+        Index(
+            "idx_files_project_parent_dir_path",
+            "project_id",
+            "parent_path",
+            "is_dir",
+            "path",
+            mysql_length={"parent_path": 255, "path": 255},
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, nullable=False)
     str_id = Column(String(44), nullable=True)
@@ -22,6 +35,8 @@ class File(Base):
     is_dir = Column(Integer, nullable=False, default=0)
     size_bytes = Column(BigInteger, nullable=True)
     hash_sha256 = Column(String(64), nullable=True)
+    # Merkle 摘要：文件为内容哈希（无哈希时取 size/mtime 指纹），目录由直接子项摘要合成
+    digest = Column(String(64), nullable=True)
     lang = Column(String(32), nullable=True)
     parent_path = Column(String(1024), nullable=True)
     last_scanned_time = Column(DateTime, nullable=True)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Numeric, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class FileEdge(Base):
+    __tablename__ = "file_edges"
+    __table_args__ = (
+        # 正向（按源文件替换/查询）与反向（谁依赖了某文件）两个方向的索引
+        Index("idx_file_edges_project_src", "project_id", "src_path", mysql_length={"src_path": 255}),
+        Index("idx_file_edges_project_dst", "project_id", "dst_path", mysql_length={"dst_path": 255}),
+        # 取当前版本 MAX(generation)
+        Index("idx_file_edges_project_generation", "project_id", "generation"),
+    )
+
+    id = Column(BigInteger, primary_key=True, nullable=False)
+    str_id = Column(String(44), nullable=True)
+    is_deleted = Column(Integer, nullable=False, default=0)
+    create_user_id = Column(BigInteger, nullable=False)
+    create_time = Column(DateTime, nullable=False, server_default=func.now())
+    update_user_id = Column(BigInteger, nullable=True)
+    update_time = Column(DateTime, nullable=True, server_default=func.now(), onupdate=func.now())
+    data_user_id = Column(BigInteger, nullable=True)
+    data_dept_id = Column(BigInteger, nullable=True)
+
+    project_id = Column(BigInteger, nullable=False)
+    src_path = Column(String(1024), nullable=False)
+    dst_path = Column(String(1024), nullable=False)
+    dep_type = Column(String(24), nullable=False)
+    inferred_by = Column(String(24), nullable=True)
+    confidence = Column(Numeric(5, 4), nullable=True)
+    # 写入该行的 infer_deps 轮次（项目内递增）
+    generation = Column(BigInteger, nullable=False, default=0)
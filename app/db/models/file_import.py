@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class FileImport(Base):
+    __tablename__ = "file_imports"
+    __table_args__ = (
+        Index("idx_file_imports_project_path", "project_id", "path", mysql_length={"path": 255}),
+    )
+
+    id = Column(BigInteger, primary_key=True, nullable=False)
+    str_id = Column(String(44), nullable=True)
+    is_deleted = Column(Integer, nullable=False, default=0)
+    create_user_id = Column(BigInteger, nullable=False)
+    create_time = Column(DateTime, nullable=False, server_default=func.now())
+    update_user_id = Column(BigInteger, nullable=True)
+    update_time = Column(DateTime, nullable=True, server_default=func.now(), onupdate=func.now())
+    data_user_id = Column(BigInteger, nullable=True)
+    data_dept_id = Column(BigInteger, nullable=True)
+
+    project_id = Column(BigInteger, nullable=False)
+    path = Column(String(1024), nullable=False)
+    st_dev = Column(BigInteger, nullable=True)
+    st_ino = Column(BigInteger, nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    mtime_ns = Column(BigInteger, nullable=True)
+    hash_sha256 = Column(String(64), nullable=True)
+    # 提取器版本：解析规则变化后旧缓存自动失效
+    extractor_version = Column(Integer, nullable=False, default=0)
+    imports_json = Column(Text, nullable=True)
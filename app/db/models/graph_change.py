@@ -0,0 +1,31 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class GraphChange(Base):
+    __tablename__ = "graph_change_log"
+    __table_args__ = (
+        # 增量同步：WHERE project_id = ? AND version > ?
+        Index("idx_graph_change_log_project_version", "project_id", "version"),
+    )
+
+    id = Column(BigInteger, primary_key=True, nullable=False)
+    str_id = Column(String(44), nullable=True)
+    is_deleted = Column(Integer, nullable=False, default=0)
+    create_user_id = Column(BigInteger, nullable=False)
+    create_time = Column(DateTime, nullable=False, server_default=func.now())
+    update_user_id = Column(BigInteger, nullable=True)
+    update_time = Column(DateTime, nullable=True, server_default=func.now(), onupdate=func.now())
+    data_user_id = Column(BigInteger, nullable=True)
+    data_dept_id = Column(BigInteger, nullable=True)
+
+    project_id = Column(BigInteger, nullable=False)
+    # 写入后的项目图版本（projects.graph_version）
+    version = Column(BigInteger, nullable=False)
+    # feature / edge
+    entity = Column(String(16), nullable=False)
+    entity_id = Column(BigInteger, nullable=False)
+    # create / update / delete
+    op = Column(String(8), nullable=False)
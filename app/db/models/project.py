@@ -21,5 +21,11 @@ class Project(Base):
     description = Column(Text, nullable=True)
     workspace_root = Column(String(1024), nullable=True)
     status = Column(String(32), nullable=True)
+    # 图谱版本：功能、依赖边、布局写入时递增（见 graph_change_log）
+    graph_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # 文件依赖版本：每轮实际写入 file_edges（含只删除边）的 infer_deps 递增，单调不回退
+    edge_generation = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # 文件索引版本：扫描新增 files 行时递增；文件树缓存与模块解析索引据此判断其他进程的写入
+    scan_generation = Column(BigInteger, nullable=False, default=0, server_default="0")
 
 
@@ -14,6 +14,8 @@ from app.routers.graph import router as graph_router
 from app.routers.sessions import router as sessions_router
 from app.routers.agents import router as agents_router
 from app.routers.tasks import router as tasks_router
+from app.services.file_watch_service import stop_all_watchers
+from app.services.import_extract_service import shutdown_extract_pool
 import app.sessions  # 导入以注册所有 @session_def
 
 
@@ -25,6 +27,8 @@ def create_app() -> FastAPI:
         pass
 
     app = FastAPI(title=settings.APP_NAME)
+    app.add_event_handler("shutdown", stop_all_watchers)
+    app.add_event_handler("shutdown", shutdown_extract_pool)
     app.add_middleware(GZipMiddleware, minimum_size=1024)
     app.add_middleware(
         CORSMiddleware,
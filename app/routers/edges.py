@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from app.core.deps import get_db
 from app.db.models.edge import Edge
 from app.schemas.edge import EdgeCreate, EdgeOut
+from app.services.graph_cache_service import invalidate_graph_snapshot
+from app.services.graph_version_service import record_graph_changes
 from app.utils.id_gen import generate_id
 
 
@@ -27,7 +29,9 @@ def create_edge(project_id: int, payload: EdgeCreate, db: Session = Depends(get_
         confidence=payload.confidence,
     )
     db.add(row)
+    record_graph_changes(db, project_id, [("edge", row.id, "create")])
     db.commit()
+    invalidate_graph_snapshot(project_id)
     db.refresh(row)
     return EdgeOut(
         id=row.id,
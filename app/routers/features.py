@@ -5,8 +5,12 @@ import json
 from app.core.deps import get_db
 from app.db.models.feature import Feature
 from app.db.models.feature_detail import FeatureDetail
-from app.schemas.feature import FeatureCreate, FeatureUpdate, FeatureOut
+from app.schemas.feature import FeatureCreate, FeatureUpdate, FeatureOut, FeatureImpactRequest
 from app.schemas.feature_detail import FeatureDetailsPayload
+from app.services.feature_file_service import affected_features, replace_feature_files
+from app.services.file_digest_service import diff_digests
+from app.services.graph_cache_service import invalidate_graph_snapshot
+from app.services.graph_version_service import record_graph_changes
 from app.utils.id_gen import generate_id
 
 
@@ -34,7 +38,9 @@ def create_feature(project_id: int, payload: FeatureCreate, db: Session = Depend
         layout_locked=0,
     )
     db.add(row)
+    record_graph_changes(db, project_id, [("feature", row.id, "create")])
     db.commit()
+    invalidate_graph_snapshot(project_id)
     db.refresh(row)
     return _to_feature_out(row)
 
@@ -64,7 +70,9 @@ def update_feature(project_id: int, feature_id: int, payload: FeatureUpdate, db:
         row.hex_r = payload.hex_r
     if payload.layout_locked is not None:
         row.layout_locked = payload.layout_locked
+    record_graph_changes(db, project_id, [("feature", row.id, "update")])
     db.commit()
+    invalidate_graph_snapshot(project_id)
     db.refresh(row)
     return _to_feature_out(row)
 
@@ -98,10 +106,33 @@ def put_feature_details(project_id: int, feature_id: int, payload: FeatureDetail
             extras_json=extras_json,
         )
         db.add(rec)
+    # 同步规范化的 文件 → 功能 关联，供变更影响查询走索引
+    replace_feature_files(db, project_id, feature_id, [f.dict() for f in (payload.files or [])])
     db.commit()
     return {"ok": True}
 
 
+@router.post("/impact")
+def post_feature_impact(project_id: int, payload: FeatureImpactRequest, db: Session = Depends(get_db)):
+    # 改动文件 → 受影响的功能；expand=true 时沿 import 反向闭包扩展
+    if payload.depth is not None and payload.depth < 1:
+        raise HTTPException(status_code=400, detail="depth must be >= 1")
+    paths = list(payload.paths or [])
+    subtrees: list[str] = []
+    diff = None
+    if payload.base is not None:
+        diff = diff_digests(db, project_id, payload.base)
+        # 摘要变化的目录已被下钻到具体文件；新增/删除的路径可能是目录，同时按子树匹配
+        paths.extend(diff["changed"])
+        for p in diff["added"] + diff["removed"]:
+            paths.append(p)
+            subtrees.append(p)
+    out = affected_features(db, project_id, paths, subtrees, payload.expand, payload.depth)
+    if diff is not None:
+        out["changes"] = diff
+    return out
+
+
 def _to_feature_out(row: Feature) -> FeatureOut:
     tags = None
     try:
@@ -1,19 +1,59 @@
-from fastapi import APIRouter, Depends
+import json
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db
 from app.db.models.file import File
-from app.schemas.file import FileOut
-from app.services.file_scan_service import scan_workspace, infer_deps, scan_one_level
+from app.db.session import SessionLocal
+from app.services.file_digest_service import diff_digests, dir_digest
+from app.services.file_edge_service import current_generation, iter_edges, load_edges
+from app.services.file_graph_service import get_file_graph
+from app.services.file_scan_service import infer_deps, iter_infer_deps, scan_one_level
+from app.services.file_tree_service import get_file_tree_cached
+from app.services.file_watch_service import ensure_watcher
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.utils.etag import etag_matches
+from app.services.scan_job_service import start_scan_job, get_scan_job, iter_job_events
 
 
 router = APIRouter(prefix="/projects/{project_id}/files", tags=["files"])
 
 
 @router.post("/scan")
-def scan_files(project_id: int, db: Session = Depends(get_db)):
-    count = scan_workspace(db, project_id)
-    return {"scanned": count}
+def scan_files(project_id: int, parallel: bool | None = None, git: bool | None = None, wait: bool = False):
+    # 后台任务：立即返回 job_id；同项目已有扫描在跑时复用该任务（attached=true）
+    job, attached = start_scan_job(project_id, parallel, git)
+    if wait:
+        job.done.wait()
+    out = job.to_dict()
+    out["attached"] = attached
+    if job.status == "done":
+        out["hash_cache"] = {"hits": job.progress.get("hash_hits", 0), "misses": job.progress.get("hash_misses", 0)}
+    return out
+
+
+@router.get("/scan/jobs/{job_id}")
+def get_scan_job_status(project_id: int, job_id: str):
+    job = get_scan_job(job_id)
+    if not job or job.project_id != project_id:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return job.to_dict()
+
+
+@router.get("/scan/jobs/{job_id}/events")
+def sse_scan_job(project_id: int, job_id: str):
+    job = get_scan_job(job_id)
+    if not job or job.project_id != project_id:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return StreamingResponse(iter_job_events(job), media_type="text/event-stream")
+
+
+# list_files 可投影的列（与 FileOut 字段一致）
+_LIST_FIELDS = ("id", "project_id", "path", "is_dir", "size_bytes", "hash_sha256", "digest", "lang", "parent_path")
 
 
 @router.get("")
@@ -23,51 +63,205 @@ def list_files(
     only_dirs: bool = False,
     limit: int = 200,
     offset: int = 0,
-    refresh: bool = True,
+    cursor: str | None = None,
+    fields: str | None = None,
+    refresh: bool | None = None,
     db: Session = Depends(get_db),
 ):
-    # 可选：仅刷新当前层级，避免全量扫描
+    # refresh 未指定时：监听器健康且该目录已同步则直接读库，否则仅刷新当前层级
+    watcher = ensure_watcher(project_id)
+    if refresh is None:
+        refresh = not (watcher is not None and watcher.healthy and watcher.is_synced(parent))
     if refresh:
+        if watcher is not None:
+            watcher.mark_synced(parent)
         scan_one_level(db, project_id, parent)
-    q = db.query(File).filter(File.project_id == project_id, File.is_deleted == 0)
+
+    names = _LIST_FIELDS
+    if fields:
+        names = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in names if f not in _LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {','.join(unknown)}")
+    # 只取所需列（Core 行，不构造 ORM 对象）；is_dir/path 总是取出用于生成游标
+    cols = [getattr(File, f) for f in names]
+    cols += [c for c in (File.is_dir, File.path) if c.key not in names]
+    stmt = select(*cols).where(File.project_id == project_id, File.is_deleted == 0)
     if parent is None:
-        q = q.filter(File.parent_path == None)  # noqa: E711
+        stmt = stmt.where(File.parent_path == None)  # noqa: E711
     else:
-        q = q.filter(File.parent_path == parent)
+        stmt = stmt.where(File.parent_path == parent)
     if only_dirs:
-        q = q.filter(File.is_dir == 1)
-    rows = q.order_by(File.is_dir.desc(), File.path.asc()).limit(limit).offset(offset).all()
-    return [FileOut.from_orm(r).dict() for r in rows]
+        stmt = stmt.where(File.is_dir == 1)
+
+    # cursor 传入（首页为空串）时走键集分页：按 (is_dir DESC, path ASC) 越过上一页最后一行，忽略 offset
+    if cursor:
+        after = decode_cursor(cursor)
+        # 游标为 [is_dir(0/1), path]；能解码但结构不符同样视为无效
+        if (
+            not after
+            or len(after) != 2
+            or after[0] not in (0, 1)
+            or isinstance(after[0], bool)
+            or not isinstance(after[1], str)
+        ):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        c_is_dir, c_path = after
+        stmt = stmt.where(
+            or_(File.is_dir < c_is_dir, and_(File.is_dir == c_is_dir, File.path > c_path))
+        )
+    stmt = stmt.order_by(File.is_dir.desc(), File.path.asc()).limit(limit)
+    if cursor is None:
+        stmt = stmt.offset(offset)
+    rows = db.execute(stmt).all()
+    items = [{f: r._mapping[f] for f in names} for r in rows]
+    if cursor is None:
+        return items
+    last = rows[-1] if len(rows) == limit and rows else None
+    return {"items": items, "next_cursor": encode_cursor(last.is_dir, last.path) if last is not None else None}
+
+
+@router.get("/digest")
+def get_digest(project_id: int, path: str | None = None, db: Session = Depends(get_db)):
+    # 目录 Merkle 摘要；path 为空表示工作区根
+    digest = dir_digest(db, project_id, path)
+    if digest is None and path is not None:
+        raise HTTPException(status_code=404, detail="Path not found or not scanned")
+    return {"path": path, "digest": digest}
+
+
+@router.post("/changes")
+def post_changes(project_id: int, body: dict, db: Session = Depends(get_db)):
+    # body: {"base": {path: digest}}，只下钻摘要不同的目录
+    base = body.get("base") or {}
+    out = diff_digests(db, project_id, base)
+    out["digest"] = dir_digest(db, project_id, None)
+    return out
+
+
+def _infer_summary(stats: dict) -> dict:
+    total = stats.get("files", 0)
+    return {
+        "cache": {
+            "files": total,
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "hit_ratio": round(stats.get("hits", 0) / total, 4) if total else None,
+        },
+        "stored": {
+            "generation": stats.get("generation", 0),
+            "sources_replaced": stats.get("sources_replaced", 0),
+            "edges_written": stats.get("edges_written", 0),
+        },
+    }
+
+
+def _ndjson(rows, flush_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    # 每行一个 JSON；攒够 flush_bytes 再写出，避免逐行写 socket
+    buf: list[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _stream_infer_deps(project_id: int, paths, parallel) -> Iterator[bytes]:
+    # 流式响应在请求依赖退出后仍在迭代，使用独立会话
+    db = SessionLocal()
+    try:
+        stats: dict = {}
+        yield from _ndjson(iter_infer_deps(db, project_id, paths, stats=stats, parallel=parallel))
+        yield from _ndjson([{"done": True, **_infer_summary(stats)}])
+    finally:
+        db.close()
+
+
+def _stream_edges(project_id: int, src, dst) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        yield from _ndjson(iter_edges(db, project_id, src, dst))
+        yield from _ndjson([{"done": True, "generation": current_generation(db, project_id)}])
+    finally:
+        db.close()
 
 
 @router.post("/infer-deps")
-def post_infer_deps(project_id: int, body: dict, db: Session = Depends(get_db)):
+def post_infer_deps(
+    project_id: int,
+    body: dict,
+    parallel: bool | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    # stream=true：NDJSON，每行一条边（逐文件产出），最后一行为 {"done": true, "cache", "stored"}
     paths = body.get("paths")
-    deps = infer_deps(db, project_id, paths)
-    return {"deps": deps}
+    if stream:
+        return StreamingResponse(_stream_infer_deps(project_id, paths, parallel), media_type="application/x-ndjson")
+    stats: dict = {}
+    deps = infer_deps(db, project_id, paths, stats=stats, parallel=parallel)
+    return {"deps": deps, **_infer_summary(stats)}
 
 
-@router.get("/tree")
-def get_file_tree(project_id: int, db: Session = Depends(get_db)):
-    rows = db.query(File).filter(File.project_id == project_id, File.is_deleted == 0).all()
-    # 构造 parent -> children 映射
-    by_parent: dict[str | None, list[File]] = {}
-    for r in rows:
-        by_parent.setdefault(r.parent_path, []).append(r)
-    for arr in by_parent.values():
-        arr.sort(key=lambda x: (0 if x.is_dir else 1, x.path))
-
-    def build_node(f: File) -> dict:
-        name = f.path.split("/")[-1] if f.path else f.path
-        node = {"id": f.path, "name": name}
-        if f.is_dir:
-            kids = by_parent.get(f.path, [])
-            if kids:
-                node["children"] = [build_node(k) for k in kids]
-        return node
-
-    roots = by_parent.get(None, [])
-    tree = [build_node(r) for r in roots]
-    return {"tree": tree}
+@router.get("/edges")
+def get_file_edges(
+    project_id: int,
+    src: list[str] | None = Query(None),
+    dst: list[str] | None = Query(None),
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    # 直接读取已持久化的依赖图（由 /infer-deps 写入），不再重新解析；stream=true 时以 NDJSON 逐行输出
+    if stream:
+        return StreamingResponse(_stream_edges(project_id, src, dst), media_type="application/x-ndjson")
+    return {
+        "edges": load_edges(db, project_id, src, dst),
+        "generation": current_generation(db, project_id),
+    }
 
 
+@router.get("/graph/dependents")
+def get_file_dependents(project_id: int, path: str, depth: int | None = Query(None, ge=1), db: Session = Depends(get_db)):
+    # 反向传递闭包：改动 path 会影响哪些文件（depth 为最大跳数，缺省不限）
+    g = get_file_graph(db, project_id)
+    items = g.closure(path, reverse=True, max_depth=depth)
+    return {"path": path, "items": items, "count": len(items), "generation": g.generation}
+
+
+@router.get("/graph/dependencies")
+def get_file_dependencies(project_id: int, path: str, depth: int | None = Query(None, ge=1), db: Session = Depends(get_db)):
+    # 正向传递闭包：path 直接或间接依赖的文件
+    g = get_file_graph(db, project_id)
+    items = g.closure(path, reverse=False, max_depth=depth)
+    return {"path": path, "items": items, "count": len(items), "generation": g.generation}
+
+
+@router.get("/graph/path")
+def get_file_dep_path(project_id: int, src: str, dst: str, db: Session = Depends(get_db)):
+    # src 沿 import 到达 dst 的最短依赖链，不可达时 path 为 null
+    g = get_file_graph(db, project_id)
+    path = g.shortest_path(src, dst)
+    return {"src": src, "dst": dst, "path": path, "hops": len(path) - 1 if path else None, "generation": g.generation}
+
+
+@router.get("/graph/cycles")
+def get_file_dep_cycles(project_id: int, min_size: int = Query(2, ge=1), db: Session = Depends(get_db)):
+    # 循环依赖：强连通分量（按大小降序）
+    g = get_file_graph(db, project_id)
+    cycles = g.strongly_connected(min_size)
+    return {"cycles": cycles, "count": len(cycles), "generation": g.generation}
+
+
+@router.get("/tree")
+def get_file_tree(project_id: int, request: Request, db: Session = Depends(get_db)):
+    # 物化树缓存：扫描写入新行后才按父目录增量重建；客户端带 If-None-Match 命中时返回 304
+    etag, body = get_file_tree_cached(db, project_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
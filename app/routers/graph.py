@@ -1,52 +1,136 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 import json
 
 from app.core.deps import get_db
 from app.db.models.feature import Feature
 from app.db.models.edge import Edge
-from app.schemas.graph import GraphSnapshot, FeatureNode, HexCell as HexCellSchema, Edge as EdgeSchema
-from app.services.layout_hex_service import plan_layout_simple, apply_layout
+from app.schemas.graph import AutoLayoutRequest, GraphDelta, GraphSnapshot, FeatureNode, HexCell as HexCellSchema, Edge as EdgeSchema
+from app.services.graph_cache_service import get_graph_snapshot, graph_cache_stats, invalidate_graph_snapshot, put_graph_snapshot
+from app.services.graph_version_service import changes_available, changes_since, current_graph_version
+from app.services.layout_hex_service import plan_layout_incremental, plan_layout_layered, plan_layout_simple, apply_layout
+from app.utils.etag import etag_matches
 
 
 router = APIRouter(prefix="/projects/{project_id}/graph", tags=["graph"])
 
 
-@router.get("", response_model=GraphSnapshot)
-def get_graph(project_id: int, db: Session = Depends(get_db)):
-    feats = db.query(Feature).filter(Feature.project_id == project_id, Feature.is_deleted == 0).all()
-    edges = db.query(Edge).filter(Edge.project_id == project_id, Edge.is_deleted == 0).all()
-    features = []
-    for f in feats:
+def _feature_node(f: Feature) -> FeatureNode:
+    tags = None
+    try:
+        tags = json.loads(f.tags_json) if f.tags_json else None
+    except Exception:
         tags = None
-        try:
-            tags = json.loads(f.tags_json) if f.tags_json else None
-        except Exception:
-            tags = None
-        features.append(FeatureNode(
-            id=f.id,
-            name=f.name,
-            description=f.description,
-            hex=(HexCellSchema(q=f.hex_q, r=f.hex_r) if f.hex_q is not None and f.hex_r is not None else None),
-            category=f.category,
-            tags=tags,
-            locked=f.layout_locked or 0,
-        ))
-    edge_list = [EdgeSchema(
+    return FeatureNode(
+        id=f.id,
+        name=f.name,
+        description=f.description,
+        hex=(HexCellSchema(q=f.hex_q, r=f.hex_r) if f.hex_q is not None and f.hex_r is not None else None),
+        category=f.category,
+        tags=tags,
+        locked=f.layout_locked or 0,
+    )
+
+
+def _edge_node(e: Edge) -> EdgeSchema:
+    return EdgeSchema(
         id=e.id,
         from_id=e.from_feature_id,
         to_id=e.to_feature_id,
         kind=e.kind,
         description=e.description,
         confidence=float(e.confidence) if e.confidence is not None else None,
-    ) for e in edges]
-    return GraphSnapshot(project_id=project_id, features=features, edges=edge_list, version=1)
+    )
+
+
+def _graph_etag(project_id: int, version: int) -> str:
+    return f'"graph-{project_id}-{version}"'
+
+
+@router.get("", response_model=GraphSnapshot)
+def get_graph(project_id: int, request: Request, db: Session = Depends(get_db)):
+    # 先读版本再读数据：期间若有写入，快照只会比版本新，客户端之后按 since 拉增量时重复的变更是幂等的
+    version = current_graph_version(db, project_id)
+    etag = _graph_etag(project_id, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = get_graph_snapshot(project_id, version)
+    if body is None:
+        feats = db.query(Feature).filter(Feature.project_id == project_id, Feature.is_deleted == 0).all()
+        edges = db.query(Edge).filter(Edge.project_id == project_id, Edge.is_deleted == 0).all()
+        body = GraphSnapshot(
+            project_id=project_id,
+            features=[_feature_node(f) for f in feats],
+            edges=[_edge_node(e) for e in edges],
+            version=version,
+        ).model_dump_json().encode("utf-8")
+        put_graph_snapshot(project_id, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/cache/stats")
+def get_graph_cache_stats(project_id: int):
+    # 计数为本进程内的全部项目
+    return graph_cache_stats()
+
+
+def _load_by_ids(db: Session, model, project_id: int, ids: list) -> dict:
+    out = {}
+    for i in range(0, len(ids), 500):
+        rows = db.query(model).filter(model.project_id == project_id, model.id.in_(ids[i:i + 500])).all()
+        out.update((r.id, r) for r in rows)
+    return out
+
+
+@router.get("/delta", response_model=GraphDelta)
+def get_graph_delta(project_id: int, since: int = Query(..., ge=0), db: Session = Depends(get_db)):
+    """返回 since 版本之后的变更：新增 / 修改的功能与边给出当前内容，删除的只给 id。"""
+    version = current_graph_version(db, project_id)
+    if since > version:
+        raise HTTPException(status_code=400, detail="since is ahead of current graph version")
+    if not changes_available(db, project_id, since, version):
+        # 日志已裁剪到 since 之后：客户端需改用 GET /graph 全量同步
+        raise HTTPException(status_code=410, detail="Change log no longer covers since; refetch the full graph")
+    delta = GraphDelta(project_id=project_id, since=since, version=version)
+    if since == version:
+        return delta
+    changes = changes_since(db, project_id, since)
+    for entity, model, to_node in (("feature", Feature, _feature_node), ("edge", Edge, _edge_node)):
+        c = changes[entity]
+        rows = _load_by_ids(db, model, project_id, c["added"] + c["changed"])
+        removed = list(c["removed"])
+        kept = {"added": [], "changed": []}
+        for kind in ("added", "changed"):
+            for eid in c[kind]:
+                r = rows.get(eid)
+                if r is None or r.is_deleted:
+                    # 软删除未写日志或行已不存在：按删除下发
+                    if kind == "changed":
+                        removed.append(eid)
+                    continue
+                kept[kind].append(to_node(r))
+        setattr(delta, f"added_{entity}s", kept["added"])
+        setattr(delta, f"changed_{entity}s", kept["changed"])
+        setattr(delta, f"removed_{entity}s", removed)
+    return delta
 
 
 @router.post("/layout/auto")
-def auto_layout(project_id: int, db: Session = Depends(get_db)):
-    pos = plan_layout_simple(db, project_id)
+def auto_layout(project_id: int, mode: str = "layered", body: AutoLayoutRequest | None = None, db: Session = Depends(get_db)):
+    # mode=layered（默认）：去环 + 最长路径分层 + 重心排序；mode=simple：旧的 BFS 分层
+    # mode=incremental：已有坐标的功能不动，只放置无坐标或 body.dirty 中列出的功能，只写回变化的坐标
+    if mode == "simple":
+        pos = plan_layout_simple(db, project_id)
+    elif mode == "layered":
+        pos = plan_layout_layered(db, project_id)
+    elif mode == "incremental":
+        pos = plan_layout_incremental(db, project_id, body.dirty if body else [])
+    else:
+        raise HTTPException(status_code=400, detail="mode must be layered, simple or incremental")
     updated = apply_layout(db, project_id, pos)
+    if updated:
+        invalidate_graph_snapshot(project_id)
     return {"updated": updated}
 
 
@@ -61,6 +145,8 @@ class LayoutItemIn:
 def put_layout(project_id: int, items: list[dict], db: Session = Depends(get_db)):
     pos = {int(it["feature_id"]): (int(it["q"]), int(it["r"])) for it in items}
     updated = apply_layout(db, project_id, pos)
+    if updated:
+        invalidate_graph_snapshot(project_id)
     return {"updated": updated}
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class FeatureCreate(BaseModel):
@@ -36,3 +36,11 @@ class FeatureOut(BaseModel):
         from_attributes = True
 
 
+
+
+class FeatureImpactRequest(BaseModel):
+    # 直接给出改动路径，或给出客户端持有的 Merkle 摘要 {path: digest}，由服务端对比当前索引得出改动
+    paths: Optional[List[str]] = None
+    base: Optional[Dict[str, Optional[str]]] = None
+    expand: bool = False
+    depth: Optional[int] = None
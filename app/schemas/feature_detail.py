@@ -1,10 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
 
 
 class FileItem(BaseModel):
     path: str
-    role: Optional[str] = None
+    # 与 feature_files.role (VARCHAR(64)) 一致
+    role: Optional[str] = Field(None, max_length=64)
     rw: Optional[Literal["r","w","rw"]] = None
     notes: Optional[str] = None
 
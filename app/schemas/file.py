@@ -9,6 +9,7 @@ class FileOut(BaseModel):
     is_dir: int
     size_bytes: Optional[int] = None
     hash_sha256: Optional[str] = None
+    digest: Optional[str] = None
     lang: Optional[str] = None
     parent_path: Optional[str] = None
     class Config:
@@ -33,3 +33,20 @@ class GraphSnapshot(BaseModel):
     version: int = 1
 
 
+
+
+class GraphDelta(BaseModel):
+    project_id: int
+    since: int
+    version: int
+    added_features: List[FeatureNode] = []
+    changed_features: List[FeatureNode] = []
+    removed_features: List[int] = []
+    added_edges: List[Edge] = []
+    changed_edges: List[Edge] = []
+    removed_edges: List[int] = []
+
+
+class AutoLayoutRequest(BaseModel):
+    # mode=incremental 时额外重新放置的功能
+    dirty: List[int] = []
@@ -0,0 +1,175 @@
+import json
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.db.models.feature import Feature
+from app.db.models.feature_detail import FeatureDetail
+from app.db.models.feature_file import FeatureFile
+from app.services.file_graph_service import get_file_graph
+from app.utils.id_gen import generate_ids
+
+
+# IN 列表 / OR 前缀条件每批的数量
+_QUERY_CHUNK = 500
+# feature_files.role 列宽
+_ROLE_MAX = 64
+
+
+def normalize_path(path: str) -> str:
+    """与 files.path 一致：正斜杠、去掉前导 "./" 与 "/"、去掉末尾 "/"。"""
+    p = path.replace("\\", "/").strip()
+    while p.startswith("./"):
+        p = p[2:]
+    return p.strip("/")
+
+
+def replace_feature_files(db: Session, project_id: int, feature_id: int, files: Iterable[Dict]) -> int:
+    """按功能整体替换 feature_files（与 files_json 同步，由 put_feature_details 调用，不提交）。"""
+    db.execute(
+        delete(FeatureFile.__table__).where(
+            FeatureFile.__table__.c.project_id == project_id,
+            FeatureFile.__table__.c.feature_id == feature_id,
+        )
+    )
+    by_path: Dict[str, Dict] = {}
+    for f in files:
+        p = normalize_path(f.get("path") or "")
+        if p:
+            by_path.setdefault(p, f)
+    if not by_path:
+        return 0
+    recs = [
+        {
+            "id": new_id,
+            "str_id": None,
+            "is_deleted": 0,
+            "create_user_id": 0,
+            "project_id": project_id,
+            "feature_id": feature_id,
+            "path": p,
+            # 旧库 files_json 中的 role 未经长度校验，回填时截断到列宽
+            "role": f.get("role")[:_ROLE_MAX] if isinstance(f.get("role"), str) else None,
+            "rw": f.get("rw"),
+        }
+        for (p, f), new_id in zip(by_path.items(), generate_ids(len(by_path)))
+    ]
+    db.execute(insert(FeatureFile.__table__), recs)
+    return len(recs)
+
+
+def backfill_feature_files(db: Session, project_id: Optional[int] = None, batch: int = 200) -> int:
+    """已有库升级（一次性迁移，见 scripts/backfill_feature_files.py）：
+    逐个功能检查，有 files_json 但没有任何 feature_files 行的功能由 files_json 生成；每 batch 个功能提交一次。
+    只补缺失的功能，重复执行是安全的。返回写入的行数。
+    """
+    has_rows = (
+        select(FeatureFile.id)
+        .where(FeatureFile.feature_id == FeatureDetail.feature_id, FeatureFile.is_deleted == 0)
+        .exists()
+    )
+    stmt = select(FeatureDetail.project_id, FeatureDetail.feature_id, FeatureDetail.files_json).where(
+        FeatureDetail.is_deleted == 0,
+        FeatureDetail.files_json.is_not(None),
+        ~has_rows,
+    )
+    if project_id is not None:
+        stmt = stmt.where(FeatureDetail.project_id == project_id)
+    n = 0
+    rows = db.execute(stmt).all()
+    for i, r in enumerate(rows, 1):
+        try:
+            files = json.loads(r.files_json) if r.files_json else []
+        except Exception:
+            files = []
+        if isinstance(files, list):
+            n += replace_feature_files(db, r.project_id, r.feature_id, [f for f in files if isinstance(f, dict)])
+        if i % batch == 0:
+            db.commit()
+    db.commit()
+    return n
+
+
+def _like_prefix(path: str) -> str:
+    return path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+
+
+def _lookup(db: Session, project_id: int, exact: List[str], subtrees: List[str]) -> List:
+    """按 (project_id, path) 索引查关联：exact 为 IN 等值，subtrees 为目录前缀（LIKE 'dir/%' 走范围扫描）。"""
+    base = (
+        select(FeatureFile.feature_id, FeatureFile.path, FeatureFile.role, FeatureFile.rw, Feature.name)
+        .join(Feature, Feature.id == FeatureFile.feature_id)
+        .where(FeatureFile.project_id == project_id, FeatureFile.is_deleted == 0, Feature.is_deleted == 0)
+    )
+    out = []
+    for i in range(0, len(exact), _QUERY_CHUNK):
+        out.extend(db.execute(base.where(FeatureFile.path.in_(exact[i:i + _QUERY_CHUNK]))).all())
+    for i in range(0, len(subtrees), _QUERY_CHUNK):
+        conds = [FeatureFile.path.like(_like_prefix(p), escape="\\") for p in subtrees[i:i + _QUERY_CHUNK]]
+        out.extend(db.execute(base.where(or_(*conds))).all())
+    return out
+
+
+def affected_features(
+    db: Session,
+    project_id: int,
+    paths: Iterable[str],
+    subtrees: Iterable[str] = (),
+    expand: bool = False,
+    depth: Optional[int] = None,
+) -> Dict:
+    """变更路径 → 受影响的功能。
+    paths 按路径精确匹配；subtrees（新增/删除的目录）匹配其下所有文件。
+    expand=True 时先沿 import 反向闭包扩展（改动文件的依赖方也视为受影响，depth 为最大跳数）。
+    """
+    # path → (距离改动的跳数, 来源改动文件)
+    reach: Dict[str, tuple] = {}
+    for p in paths:
+        p = normalize_path(p)
+        if p:
+            reach[p] = (0, p)
+    roots = sorted({normalize_path(p) for p in subtrees} - {""})
+    generation = None
+    if expand:
+        g = get_file_graph(db, project_id)
+        generation = g.generation
+        seeds = list(reach)
+        if roots:
+            prefixes = tuple(r + "/" for r in roots)
+            seeds.extend(p for p in g.paths if p.startswith(prefixes))
+        for s in seeds:
+            reach.setdefault(s, (0, s))
+            for item in g.closure(s, reverse=True, max_depth=depth):
+                prev = reach.get(item["path"])
+                if prev is None or item["depth"] < prev[0]:
+                    reach[item["path"]] = (item["depth"], s)
+
+    features: Dict[int, Dict] = {}
+    seen = set()
+    for r in _lookup(db, project_id, sorted(reach), roots):
+        if (r.feature_id, r.path) in seen:
+            continue
+        hit = reach.get(r.path)
+        if hit is None:
+            # MySQL 默认排序规则大小写不敏感，IN / LIKE 可能匹配到大小写不同的路径，按路径精确比较后跳过
+            via = next((x for x in roots if r.path.startswith(x + "/")), None)
+            if via is None:
+                continue
+            hit = (0, via)
+        seen.add((r.feature_id, r.path))
+        f = features.get(r.feature_id)
+        if f is None:
+            f = features[r.feature_id] = {"feature_id": r.feature_id, "name": r.name, "files": [], "min_depth": None}
+        d, via = hit
+        f["files"].append({"path": r.path, "role": r.role, "rw": r.rw, "depth": d, "via": via})
+        f["min_depth"] = d if f["min_depth"] is None else min(f["min_depth"], d)
+    items = sorted(features.values(), key=lambda f: (f["min_depth"], f["feature_id"]))
+    for f in items:
+        f["files"].sort(key=lambda x: (x["depth"], x["path"]))
+    return {
+        "features": items,
+        "count": len(items),
+        "paths_considered": len(reach) + len(roots),
+        "generation": generation,
+    }
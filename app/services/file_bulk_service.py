@@ -0,0 +1,181 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.db.models.file import File
+from app.db.models.project import Project
+from app.utils.id_gen import generate_ids
+
+
+# 参与“是否变化”比较并在冲突时更新的列
+_COMPARE_COLS = ("size_bytes", "hash_sha256", "lang", "parent_path", "digest")
+_UPDATE_COLS = _COMPARE_COLS + ("last_scanned_time",)
+
+# 单次写入记录的新增文件路径上限，超过后置 None（下游整体重建而非增量）
+_NEW_FILES_CAP = 4096
+
+_INDEX_COLS = (
+    File.id,
+    File.path,
+    File.is_dir,
+    File.size_bytes,
+    File.hash_sha256,
+    File.digest,
+    File.lang,
+    File.parent_path,
+    File.last_scanned_time,
+)
+
+
+def current_scan_generation(db: Session, project_id: int) -> int:
+    """files 索引的版本（projects.scan_generation）：进程内缓存（文件树、模块解析索引）每次读取时与之比对，
+    其他进程的扫描写入同样可见。项目行不存在时退回项目内最大的 files.id（新行 id 单调递增）。
+    """
+    v = db.execute(select(Project.scan_generation).where(Project.id == project_id)).scalar()
+    if v is None:
+        return db.execute(
+            select(func.coalesce(func.max(File.id), 0)).where(File.project_id == project_id)
+        ).scalar() or 0
+    return v
+
+
+def next_scan_generation(db: Session, project_id: int) -> Optional[int]:
+    """在调用方事务内递增 projects.scan_generation 并返回新值；项目行不存在时返回 None。"""
+    t = Project.__table__
+    res = db.execute(update(t).where(t.c.id == project_id).values(scan_generation=t.c.scan_generation + 1))
+    if not res.rowcount:
+        return None
+    return db.execute(select(Project.scan_generation).where(Project.id == project_id)).scalar()
+
+
+def local_writes_cover(built: int, current: int, local: Set[int]) -> bool:
+    """built 之后直到 current 的每个版本都由本进程写入（local 中有记录）时，进程内的增量信息是完整的。"""
+    return all(v in local for v in range(built + 1, current + 1))
+
+
+def load_paths_index(db: Session, project_id: int, paths: Iterable[str]) -> Dict[Tuple[str, int], object]:
+    """按路径集合（一个扫描批次）查询现有索引，内存随批次大小而非项目规模增长。"""
+    paths = list(set(paths))
+    if not paths:
+        return {}
+    stmt = select(*_INDEX_COLS).where(
+        File.project_id == project_id,
+        File.is_deleted == 0,
+        File.path.in_(paths),
+    )
+    return {(r.path, int(r.is_dir)): r for r in db.execute(stmt)}
+
+
+def bulk_upsert(db: Session, table, rows: List[dict], update_cols: Iterable[str], new_ids: Set[int]) -> None:
+    """按主键 id 多行 upsert：MySQL 为 INSERT ... ON DUPLICATE KEY UPDATE，SQLite 为 ON CONFLICT DO UPDATE，
+    其他方言退化为 executemany 的 INSERT（new_ids 内）+ UPDATE（其余）。"""
+    if not rows:
+        return
+    update_cols = tuple(update_cols)
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {**{c: stmt.inserted[c] for c in update_cols}, "update_time": func.now()}
+        )
+        db.execute(stmt)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={**{c: stmt.excluded[c] for c in update_cols}, "update_time": func.now()},
+        )
+        db.execute(stmt)
+    else:
+        inserts = [r for r in rows if r["id"] in new_ids]
+        updates = [{"b_id": r["id"], **{c: r[c] for c in update_cols}} for r in rows if r["id"] not in new_ids]
+        if inserts:
+            db.execute(insert(table), inserts)
+        if updates:
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(
+                    {c: bindparam(c) for c in update_cols}
+                ),
+                updates,
+            )
+
+
+class FileBulkWriter:
+    """files 表批量写入：
+    - 仅 size/hash/lang/parent/digest 有变化的行入队，未变化的行不产生写入；
+    - 新行 id 预先由 Snowflake 批量分配；
+    - 每 chunk_size 行经 bulk_upsert 发出一条多行 upsert。
+    """
+
+    def __init__(self, db: Session, project_id: int, now: datetime, chunk_size: Optional[int] = None) -> None:
+        self.db = db
+        self.project_id = project_id
+        self.now = now
+        self.chunk_size = max(1, chunk_size or settings.SCAN_WRITE_CHUNK)
+        self.written = 0
+        # 新增行的父目录（提交后用于文件树缓存标脏）
+        self.new_parents: Set[Optional[str]] = set()
+        # 新增文件路径（提交后用于模块解析索引增量追加）；超过上限为 None
+        self.new_files: Optional[List[str]] = []
+        self._pending: List[dict] = []
+        self._new: List[dict] = []
+
+    def upsert(
+        self,
+        row,
+        path: str,
+        is_dir: int,
+        size_bytes: Optional[int],
+        hash_sha256: Optional[str],
+        lang: Optional[str],
+        parent_path: Optional[str],
+        digest: Optional[str] = None,
+    ) -> None:
+        """row 为 (path, is_dir) 对应的现有索引行（Core Row），不存在时为 None。"""
+        values = {
+            "size_bytes": size_bytes,
+            "hash_sha256": hash_sha256,
+            "lang": lang,
+            "parent_path": parent_path,
+            "digest": digest,
+        }
+        if row is not None and all(getattr(row, c) == values[c] for c in _COMPARE_COLS):
+            return
+        rec = {
+            "id": row.id if row is not None else None,
+            "str_id": None,
+            "is_deleted": 0,
+            "create_user_id": 0,
+            "project_id": self.project_id,
+            "path": path,
+            "is_dir": is_dir,
+            "last_scanned_time": self.now,
+            **values,
+        }
+        self._pending.append(rec)
+        if row is None:
+            self._new.append(rec)
+            self.new_parents.add(parent_path)
+            if not is_dir and self.new_files is not None:
+                self.new_files.append(path)
+                if len(self.new_files) > _NEW_FILES_CAP:
+                    self.new_files = None
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        for rec, new_id in zip(self._new, generate_ids(len(self._new))):
+            rec["id"] = new_id
+        new_ids = {rec["id"] for rec in self._new}
+        rows, self._pending, self._new = self._pending, [], []
+
+        bulk_upsert(self.db, File.__table__, rows, _UPDATE_COLS, new_ids)
+        self.written += len(rows)
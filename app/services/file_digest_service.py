@@ -0,0 +1,183 @@
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.file import File
+from app.services.hash_cache_service import Fingerprint
+
+
+def leaf_digest(hash_sha256: Optional[str], fp: Optional[Fingerprint]) -> Optional[str]:
+    """文件摘要：有内容哈希时即为哈希本身；未哈希（SCAN_HASH=false 或超出大小上限）时取 size/mtime 指纹。"""
+    if hash_sha256:
+        return hash_sha256
+    if fp is None:
+        return None
+    return hashlib.sha256(f"fp:{fp[2]}:{fp[3]}".encode()).hexdigest()
+
+
+_MASK = (1 << 256) - 1
+
+
+def _term(name: str, is_dir: int, digest: Optional[str]) -> int:
+    h = hashlib.sha256(f"{int(is_dir)}\0{name}\0{digest or ''}".encode("utf-8", "surrogateescape"))
+    return int.from_bytes(h.digest(), "big")
+
+
+def _finish(acc: int, count: int) -> str:
+    # 子项摘要按 2^256 取模求和（与顺序无关），流式遍历无需保留/排序子项列表
+    return hashlib.sha256(f"{count}:{acc:064x}".encode()).hexdigest()
+
+
+def combine(children: Iterable[Tuple[str, int, Optional[str]]]) -> str:
+    """由直接子项 (name, is_dir, digest) 合成目录摘要。"""
+    acc = 0
+    count = 0
+    for name, is_dir, digest in children:
+        acc = (acc + _term(name, is_dir, digest)) & _MASK
+        count += 1
+    return _finish(acc, count)
+
+
+class DigestBuilder:
+    """自底向上累积目录摘要：每个目录只保留一个累加器，内存与目录数而非文件数相关。"""
+
+    def __init__(self) -> None:
+        self._acc: Dict[str, List[int]] = {".": [0, 0]}
+
+    def add_file(self, rel_path: str, digest: Optional[str]) -> None:
+        self._add(rel_path, 0, digest)
+
+    def add_dir(self, rel_path: str) -> None:
+        self._acc.setdefault(rel_path, [0, 0])
+
+    def _add(self, rel_path: str, is_dir: int, digest: Optional[str]) -> None:
+        parent = os.path.dirname(rel_path) or "."
+        slot = self._acc.setdefault(parent, [0, 0])
+        slot[0] = (slot[0] + _term(os.path.basename(rel_path), is_dir, digest)) & _MASK
+        slot[1] += 1
+
+    def finish(self) -> Dict[str, str]:
+        """按深度由深到浅定稿，返回 {目录路径: 摘要}（根目录键为 "."）。"""
+        out: Dict[str, str] = {}
+        for d in sorted(self._acc, key=lambda p: -1 if p == "." else p.count("/"), reverse=True):
+            acc, count = self._acc[d]
+            out[d] = _finish(acc, count)
+            if d != ".":
+                self._add(d, 1, out[d])
+        return out
+
+
+def compute_dir_digests(db: Session, project_id: int) -> Dict[str, str]:
+    """全量扫描写入完成后，由 files 表中的行（与 refresh_ancestor_digests 相同的数据源）流式合成全部目录摘要；
+    同一份索引无论由全量扫描还是单层刷新得出，目录摘要都一致。"""
+    digests = DigestBuilder()
+    stmt = (
+        select(File.path, File.is_dir, File.digest)
+        .where(File.project_id == project_id, File.is_deleted == 0)
+        .execution_options(yield_per=max(1, settings.SCAN_WRITE_CHUNK))
+    )
+    for r in db.execute(stmt):
+        if r.is_dir:
+            digests.add_dir(r.path)
+        else:
+            digests.add_file(r.path, r.digest)
+    return digests.finish()
+
+
+def write_dir_digests(db: Session, project_id: int, digests: Dict[str, str]) -> int:
+    """批量写回目录摘要（仅变化的行），返回写入行数。根目录 "." 不在 files 表中，跳过。"""
+    paths = [p for p in digests if p != "."]
+    stmt = (
+        update(File.__table__)
+        .where(File.__table__.c.id == bindparam("b_id"))
+        .values(digest=bindparam("digest"))
+    )
+    written = 0
+    chunk = max(1, settings.SCAN_WRITE_CHUNK)
+    for i in range(0, len(paths), chunk):
+        part = paths[i:i + chunk]
+        rows = db.execute(
+            select(File.id, File.path, File.digest).where(
+                File.project_id == project_id,
+                File.is_deleted == 0,
+                File.is_dir == 1,
+                File.path.in_(part),
+            )
+        )
+        params = [{"b_id": r.id, "digest": digests[r.path]} for r in rows if r.digest != digests[r.path]]
+        if params:
+            db.execute(stmt, params)
+            written += len(params)
+    return written
+
+
+def _children(db: Session, project_id: int, parent: Optional[str]):
+    stmt = select(File.path, File.is_dir, File.digest).where(File.project_id == project_id, File.is_deleted == 0)
+    if parent is None:
+        stmt = stmt.where(File.parent_path == None)  # noqa: E711
+    else:
+        stmt = stmt.where(File.parent_path == parent)
+    return db.execute(stmt).all()
+
+
+def dir_digest(db: Session, project_id: int, path: Optional[str]) -> Optional[str]:
+    """读取目录摘要；path=None 为工作区根，由第一层子项即时合成（根不在 files 表中）。"""
+    if path is None:
+        return combine((os.path.basename(r.path), r.is_dir, r.digest) for r in _children(db, project_id, None))
+    return db.execute(
+        select(File.digest).where(
+            File.project_id == project_id,
+            File.is_deleted == 0,
+            File.path == path,
+        )
+    ).scalar()
+
+
+def refresh_ancestor_digests(db: Session, project_id: int, parent: Optional[str]) -> None:
+    """单层刷新后，由 parent 起逐级向上重算目录摘要；某一级未变化即停止。"""
+    d = parent
+    while d:
+        digest = combine((os.path.basename(r.path), r.is_dir, r.digest) for r in _children(db, project_id, d))
+        row = db.execute(
+            select(File.id, File.digest).where(
+                File.project_id == project_id,
+                File.is_deleted == 0,
+                File.is_dir == 1,
+                File.path == d,
+            )
+        ).first()
+        if row is None or row.digest == digest:
+            return
+        db.execute(update(File.__table__).where(File.__table__.c.id == row.id).values(digest=digest))
+        d = os.path.dirname(d) or None
+
+
+def diff_digests(db: Session, project_id: int, base: Dict[str, Optional[str]]) -> Dict[str, List[str]]:
+    """对比客户端持有的 {path: digest} 与当前索引，只下钻摘要不同的目录（代价与变化量相关）。
+    新增目录只报告目录本身；base 中存在但当前已不存在的路径计入 removed。
+    """
+    base_by_parent: Dict[Optional[str], List[str]] = {}
+    for p in base:
+        base_by_parent.setdefault(os.path.dirname(p) or None, []).append(p)
+
+    added: List[str] = []
+    changed: List[str] = []
+    removed: List[str] = []
+    queue: List[Optional[str]] = [None]
+    while queue:
+        d = queue.pop()
+        seen = set()
+        for r in _children(db, project_id, d):
+            seen.add(r.path)
+            if r.path not in base:
+                added.append(r.path)
+            elif base[r.path] != r.digest:
+                changed.append(r.path)
+                if r.is_dir:
+                    queue.append(r.path)
+        removed.extend(p for p in base_by_parent.get(d, ()) if p not in seen)
+    return {"added": sorted(added), "changed": sorted(changed), "removed": sorted(removed)}
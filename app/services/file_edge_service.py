@@ -0,0 +1,155 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.file_edge import FileEdge
+from app.db.models.project import Project
+from app.utils.id_gen import generate_ids
+
+
+def _max_row_generation(db: Session, project_id: int) -> int:
+    return db.execute(
+        select(func.coalesce(func.max(FileEdge.generation), 0)).where(FileEdge.project_id == project_id)
+    ).scalar() or 0
+
+
+def current_generation(db: Session, project_id: int) -> int:
+    """项目当前的文件依赖版本：取 projects.edge_generation（只删除边的写入同样推进）；
+    项目行不存在时退回 file_edges 中的最大 generation。
+    """
+    v = db.execute(select(Project.edge_generation).where(Project.id == project_id)).scalar()
+    if v is None:
+        return _max_row_generation(db, project_id)
+    return v
+
+
+def next_generation(db: Session, project_id: int) -> int:
+    """在调用方事务内分配新版本：UPDATE projects SET edge_generation = edge_generation + 1，
+    并发写入按行锁串行；计数落后于已有行（未回填的旧库）时跳到 max+1。
+    """
+    t = Project.__table__
+    res = db.execute(update(t).where(t.c.id == project_id).values(edge_generation=t.c.edge_generation + 1))
+    floor = _max_row_generation(db, project_id) + 1
+    if not res.rowcount:
+        return floor
+    v = db.execute(select(Project.edge_generation).where(Project.id == project_id)).scalar()
+    if v < floor:
+        db.execute(update(t).where(t.c.id == project_id).values(edge_generation=floor))
+        v = floor
+    return v
+
+
+def _edge_key(dst: str, dep_type: str, confidence) -> tuple:
+    return dst, dep_type, round(float(confidence), 4) if confidence is not None else None
+
+
+class FileEdgeWriter:
+    """file_edges 按源文件整体替换：与已存边集合比较，只有变化的源文件才 DELETE + 批量 INSERT。
+    generation 在首次真正写入时才分配（next_generation），未变化的推断不推进版本。
+    """
+
+    def __init__(self, db: Session, project_id: int) -> None:
+        self.db = db
+        self.project_id = project_id
+        self.generation: Optional[int] = None
+        self.sources_replaced = 0
+        self.edges_written = 0
+        self.changed_sources: Set[str] = set()
+
+    def replace(self, edges_by_src: Dict[str, List[Dict]]) -> List[str]:
+        """edges_by_src：本批全部源文件 → 推断出的边（无边的源文件传空列表，用于清除旧边）。
+        返回本批实际替换的源文件。"""
+        if not edges_by_src:
+            return []
+        srcs = list(edges_by_src)
+        stored: Dict[str, set] = {s: set() for s in srcs}
+        rows = self.db.execute(
+            select(FileEdge.src_path, FileEdge.dst_path, FileEdge.dep_type, FileEdge.confidence).where(
+                FileEdge.project_id == self.project_id,
+                FileEdge.is_deleted == 0,
+                FileEdge.src_path.in_(srcs),
+            )
+        )
+        for r in rows:
+            stored[r.src_path].add(_edge_key(r.dst_path, r.dep_type, r.confidence))
+
+        changed = [
+            s for s in srcs
+            if stored[s] != {_edge_key(e["dst"], e["dep_type"], e["confidence"]) for e in edges_by_src[s]}
+        ]
+        if not changed:
+            return []
+        if self.generation is None:
+            self.generation = next_generation(self.db, self.project_id)
+
+        self.db.execute(
+            delete(FileEdge.__table__).where(
+                FileEdge.__table__.c.project_id == self.project_id,
+                FileEdge.__table__.c.src_path.in_(changed),
+            )
+        )
+        new_rows = [e for s in changed for e in edges_by_src[s]]
+        ids = generate_ids(len(new_rows))
+        recs = [
+            {
+                "id": new_id,
+                "str_id": None,
+                "is_deleted": 0,
+                "create_user_id": 0,
+                "project_id": self.project_id,
+                "src_path": e["src"],
+                "dst_path": e["dst"],
+                "dep_type": e["dep_type"],
+                "inferred_by": e.get("inferred_by"),
+                "confidence": e.get("confidence"),
+                "generation": self.generation,
+            }
+            for e, new_id in zip(new_rows, ids)
+        ]
+        chunk = max(1, settings.SCAN_WRITE_CHUNK)
+        for i in range(0, len(recs), chunk):
+            self.db.execute(insert(FileEdge.__table__), recs[i:i + chunk])
+        self.changed_sources.update(changed)
+        self.sources_replaced += len(changed)
+        self.edges_written += len(recs)
+        return changed
+
+
+def iter_edges(
+    db: Session,
+    project_id: int,
+    src: Optional[Sequence[str]] = None,
+    dst: Optional[Sequence[str]] = None,
+) -> Iterator[Dict]:
+    """读取已存储的文件依赖；src / dst 为可选过滤（走对应方向的索引）。按批从游标读取，不一次性载入。"""
+    stmt = select(
+        FileEdge.src_path,
+        FileEdge.dst_path,
+        FileEdge.dep_type,
+        FileEdge.inferred_by,
+        FileEdge.confidence,
+    ).where(FileEdge.project_id == project_id, FileEdge.is_deleted == 0)
+    if src:
+        stmt = stmt.where(FileEdge.src_path.in_(list(src)))
+    if dst:
+        stmt = stmt.where(FileEdge.dst_path.in_(list(dst)))
+    stmt = stmt.order_by(FileEdge.src_path, FileEdge.dst_path).execution_options(yield_per=settings.SCAN_WRITE_CHUNK)
+    for r in db.execute(stmt):
+        yield {
+            "src": r.src_path,
+            "dst": r.dst_path,
+            "dep_type": r.dep_type,
+            "inferred_by": r.inferred_by,
+            "confidence": float(r.confidence) if r.confidence is not None else None,
+        }
+
+
+def load_edges(
+    db: Session,
+    project_id: int,
+    src: Optional[Sequence[str]] = None,
+    dst: Optional[Sequence[str]] = None,
+) -> List[Dict]:
+    return list(iter_edges(db, project_id, src, dst))
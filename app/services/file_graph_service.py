@@ -0,0 +1,238 @@
+import threading
+from array import array
+from collections import deque
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models.file_edge import FileEdge
+from app.services.file_edge_service import current_generation
+
+
+def _csr(n: int, us: array, vs: array) -> Tuple[array, array]:
+    """边表 (us[i] → vs[i]) → CSR：off[u]..off[u+1] 为 u 的邻接区间（计数排序，O(V+E)）。"""
+    off = array("i", [0]) * (n + 1)
+    for u in us:
+        off[u + 1] += 1
+    for i in range(n):
+        off[i + 1] += off[i]
+    adj = array("i", [0]) * len(us)
+    pos = array("i", off)
+    for u, v in zip(us, vs):
+        adj[pos[u]] = v
+        pos[u] += 1
+    return off, adj
+
+
+class FileGraph:
+    """项目文件依赖图的紧凑内存表示：路径映射为 int id，边表与正向/反向邻接（CSR）均为 array('i')。
+    由 file_edges 构建，generation 与表中一致时直接复用。
+    """
+
+    def __init__(self, generation: int, edges: Iterable[Tuple[str, str]]) -> None:
+        self.generation = generation
+        self.paths: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._src = array("i")
+        self._dst = array("i")
+        self._append(edges)
+        self._freeze()
+
+    def _id(self, path: str) -> int:
+        i = self.ids.get(path)
+        if i is None:
+            i = self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        return i
+
+    def _append(self, edges: Iterable[Tuple[str, str]]) -> None:
+        for src, dst in edges:
+            self._src.append(self._id(src))
+            self._dst.append(self._id(dst))
+
+    def _freeze(self) -> None:
+        n = len(self.paths)
+        self.fwd_off, self.fwd_adj = _csr(n, self._src, self._dst)
+        self.rev_off, self.rev_adj = _csr(n, self._dst, self._src)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._src)
+
+    def replace_sources(self, generation: int, sources: Set[str], edges: Iterable[Tuple[str, str]]) -> None:
+        """增量刷新：丢弃 sources 的出边，换为 edges（只含这些源文件的新边），再重建 CSR（纯内存）。"""
+        drop = {self.ids[s] for s in sources if s in self.ids}
+        if drop:
+            keep = [u not in drop for u in self._src]
+            self._src = array("i", compress(self._src, keep))
+            self._dst = array("i", compress(self._dst, keep))
+        self._append(edges)
+        self._freeze()
+        self.generation = generation
+
+    # ---- 查询 ----
+    def _bfs(self, start: int, off: array, adj: array, max_depth: Optional[int]) -> List[Tuple[int, int]]:
+        depth = {start: 0}
+        order: List[Tuple[int, int]] = []
+        q = deque([start])
+        while q:
+            u = q.popleft()
+            d = depth[u]
+            if max_depth is not None and d >= max_depth:
+                continue
+            for k in range(off[u], off[u + 1]):
+                v = adj[k]
+                if v not in depth:
+                    depth[v] = d + 1
+                    order.append((v, d + 1))
+                    q.append(v)
+        return order
+
+    def closure(self, path: str, reverse: bool, max_depth: Optional[int] = None) -> List[Dict]:
+        """k 跳传递闭包：reverse=True 为“谁依赖它”（反向边），否则为“它依赖谁”；max_depth=None 不限层数。"""
+        i = self.ids.get(path)
+        if i is None:
+            return []
+        off, adj = (self.rev_off, self.rev_adj) if reverse else (self.fwd_off, self.fwd_adj)
+        return [{"path": self.paths[v], "depth": d} for v, d in self._bfs(i, off, adj, max_depth)]
+
+    def shortest_path(self, src: str, dst: str) -> Optional[List[str]]:
+        """沿依赖方向的最短路径（BFS，按边数），不可达返回 None。"""
+        a, b = self.ids.get(src), self.ids.get(dst)
+        if a is None or b is None:
+            return None
+        if a == b:
+            return [src]
+        parent = array("i", [-1]) * len(self.paths)
+        parent[a] = a
+        q = deque([a])
+        while q:
+            u = q.popleft()
+            for k in range(self.fwd_off[u], self.fwd_off[u + 1]):
+                v = self.fwd_adj[k]
+                if parent[v] != -1:
+                    continue
+                parent[v] = u
+                if v == b:
+                    out = [v]
+                    while out[-1] != a:
+                        out.append(parent[out[-1]])
+                    return [self.paths[x] for x in reversed(out)]
+                q.append(v)
+        return None
+
+    def strongly_connected(self, min_size: int = 2) -> List[List[str]]:
+        """Tarjan 强连通分量（显式栈迭代，不受递归深度限制）；默认只返回成环的分量（大小 ≥ 2）。"""
+        n = len(self.paths)
+        index = array("i", [-1]) * n
+        low = array("i", [0]) * n
+        on_stack = bytearray(n)
+        stack: List[int] = []
+        out: List[List[str]] = []
+        counter = 0
+        off, adj = self.fwd_off, self.fwd_adj
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            # 调用栈帧：(节点, 下一条待访问边的位置)
+            work = [(root, off[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                u, k = work[-1]
+                if k < off[u + 1]:
+                    work[-1] = (u, k + 1)
+                    v = adj[k]
+                    if index[v] == -1:
+                        index[v] = low[v] = counter
+                        counter += 1
+                        stack.append(v)
+                        on_stack[v] = 1
+                        work.append((v, off[v]))
+                    elif on_stack[v] and index[v] < low[u]:
+                        low[u] = index[v]
+                    continue
+                work.pop()
+                if work:
+                    p = work[-1][0]
+                    if low[u] < low[p]:
+                        low[p] = low[u]
+                if low[u] == index[u]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        comp.append(w)
+                        if w == u:
+                            break
+                    if len(comp) >= min_size:
+                        out.append(sorted(self.paths[w] for w in comp))
+        out.sort(key=lambda c: (-len(c), c[0]))
+        return out
+
+
+class _Entry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.graph: Optional[FileGraph] = None
+        self.pending: Set[str] = set()
+        # 本进程写入时分配的 generation；表中版本在 graph.generation 之后的每一个都在其中才可增量刷新
+        self.pending_generations: Set[int] = set()
+
+
+_graphs: Dict[int, _Entry] = {}
+_graphs_lock = threading.Lock()
+
+
+def _entry(project_id: int) -> _Entry:
+    with _graphs_lock:
+        e = _graphs.get(project_id)
+        if e is None:
+            e = _graphs[project_id] = _Entry()
+        return e
+
+
+def notify_edges_changed(project_id: int, sources: Iterable[str], generation: int) -> None:
+    """infer_deps 提交后调用：记录被替换的源文件，下次查询时只重载这些源文件的出边。"""
+    e = _entry(project_id)
+    with e.lock:
+        if e.graph is None:
+            return
+        e.pending.update(sources)
+        e.pending_generations.add(generation)
+
+
+def get_file_graph(db: Session, project_id: int) -> FileGraph:
+    generation = current_generation(db, project_id)
+    e = _entry(project_id)
+    with e.lock:
+        g = e.graph
+        base = select(FileEdge.src_path, FileEdge.dst_path).where(
+            FileEdge.project_id == project_id,
+            FileEdge.is_deleted == 0,
+        )
+        own = e.pending_generations
+        if (
+            g is not None
+            and e.pending
+            and all(v in own for v in range(g.generation + 1, generation + 1))
+        ):
+            # 构建以来只有本进程的写入（infer_deps 逐批提交，同一轮各批共用一个 generation）：
+            # 只要有待处理的源文件就重载其出边，不以 generation 是否变化为准
+            pending = list(e.pending)
+            edges = []
+            for i in range(0, len(pending), 500):
+                edges.extend(db.execute(base.where(FileEdge.src_path.in_(pending[i:i + 500]))).all())
+            g.replace_sources(max(generation, max(own)), set(pending), edges)
+        elif g is not None and g.generation == generation:
+            return g
+        else:
+            # 首次或有未知来源的写入（如其他进程）：整体重建
+            g = e.graph = FileGraph(generation, db.execute(base).all())
+        e.pending = set()
+        e.pending_generations = set()
+        return g
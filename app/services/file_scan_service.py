@@ -1,16 +1,28 @@
 import hashlib
 import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
-import re
-import ast
+from typing import Optional, List, Dict, Iterable, Iterator, NamedTuple, Set
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.models.file import File
-from app.utils.id_gen import generate_id
+from app.services.file_bulk_service import FileBulkWriter, load_paths_index, next_scan_generation
+from app.services.file_edge_service import FileEdgeWriter, current_generation
+from app.services.file_digest_service import compute_dir_digests, leaf_digest, refresh_ancestor_digests, write_dir_digests
+from app.services.file_graph_service import notify_edges_changed
+from app.services.file_tree_service import mark_tree_dirty
+from app.services.git_index_service import GitIndexEntry, git_index_mtime_ns, read_git_index
+from app.services.import_cache_service import ImportCache
+from app.services.module_index_service import get_module_index, notify_files_added
+from app.services.import_extract_service import extract_many, extractor_version, read_and_extract
+from app.services.ignore_service import IgnoreMatcher, matcher_for_dir
+from app.services.hash_cache_service import Fingerprint, HashCache, load_dir_fingerprint, save_dir_fingerprint
 
 
 LANG_EXT = {
@@ -35,249 +47,501 @@ def _sha256_of_file(path: Path) -> Optional[str]:
         return None
 
 
-def scan_workspace(db: Session, project_id: int, root: Optional[str] = None) -> int:
-    root_dir = Path(root or settings.WORKSPACE_ROOT)
-    now = datetime.utcnow()
+class ScanEntry(NamedTuple):
+    rel_path: str
+    is_dir: int
+    size: Optional[int]
+    fp: Optional[Fingerprint]
+    full_path: Optional[str]
+    blob: Optional[str] = None  # git 索引中的 blob id（仅 git 索引模式）
 
-    existing = {
-        (r.path, int(r.is_dir)): r
-        for r in db.query(File).filter(File.project_id == project_id, File.is_deleted == 0).all()
-    }
-
-    def upsert_file(path: str, is_dir: int, **fields):
-        key = (path, is_dir)
-        row = existing.get(key)
-        if row is None:
-            row = File(
-                id=generate_id(),
-                str_id=None,
-                is_deleted=0,
-                create_user_id=0,
-                project_id=project_id,
-                path=path,
-                is_dir=is_dir,
-            )
-            existing[key] = row
-            db.add(row)
-        for k, v in fields.items():
-            setattr(row, k, v)
 
-    count = 0
+def _fingerprint(st: os.stat_result) -> Fingerprint:
+    # 两种扫描方式都由 stat 得到指纹，可共享哈希缓存；dev/ino 截为 32 位以保持与已有缓存行一致
+    return (st.st_dev & 0xFFFFFFFF, st.st_ino & 0xFFFFFFFF, st.st_size, st.st_mtime_ns)
+
+
+def _stat_file(full_path: str, rel_path: str) -> ScanEntry:
+    try:
+        st = os.stat(full_path)
+        size = st.st_size
+        fp = _fingerprint(st)
+    except Exception:
+        size = None
+        fp = None
+    return ScanEntry(rel_path, 0, size, fp, full_path)
+
+
+def _walk_serial(root_dir: Path) -> Iterator[ScanEntry]:
+    """单线程 os.walk 遍历（原有路径，保留用于对比）。"""
+    matchers = {".": IgnoreMatcher.for_root(root_dir)}
     for dirpath, dirnames, filenames in os.walk(root_dir):
         rel_dir = os.path.relpath(dirpath, root_dir).replace("\\", "/")
         rel_dir = "." if rel_dir == "." else rel_dir
+        matcher = matchers.pop(rel_dir).child(dirpath, rel_dir, ".gitignore" in filenames)
 
-        # 1) 忽略大目录
-        dirnames[:] = [d for d in dirnames if d not in settings.SCAN_IGNORE_DIRS]
+        # 1) 忽略大目录与 .gitignore 命中的子树（下钻前剪枝）
+        dirnames[:] = [
+            d for d in dirnames
+            if d not in settings.SCAN_IGNORE_DIRS and not matcher.is_ignored(_join_rel(rel_dir, d), True)
+        ]
 
         # 2) 限制深度
         depth = 0 if rel_dir == "." else rel_dir.count("/") + 1
         if depth >= settings.SCAN_MAX_DEPTH:
             dirnames[:] = []
+        for d in dirnames:
+            matchers[_join_rel(rel_dir, d)] = matcher
 
         if rel_dir != ".":
-            parent = os.path.dirname(rel_dir).replace("\\", "/") if rel_dir else None
-            upsert_file(
-                rel_dir,
-                1,
-                size_bytes=None,
-                hash_sha256=None,
-                lang=None,
-                parent_path=parent if parent else None,
-                last_scanned_time=now,
-            )
-            count += 1
+            yield ScanEntry(rel_dir, 1, None, None, None)
 
         for name in filenames:
-            full_path = Path(dirpath) / name
-            rel_path = os.path.relpath(full_path, root_dir).replace("\\", "/")
-            try:
-                st = full_path.stat()
-                size = st.st_size
-                mtime = st.st_mtime
-            except Exception:
-                size = None
-                mtime = None
-
-            ext = full_path.suffix.lower()
-            lang = LANG_EXT.get(ext)
-            parent = os.path.dirname(rel_path).replace("\\", "/") if "/" in rel_path else None
-
-            # 3) 增量：如果未变化则仅更新时间戳
-            row = existing.get((rel_path, 0))
-            unchanged = False
-            if row is not None and size is not None and mtime is not None and row.size_bytes == size and row.last_scanned_time:
-                try:
-                    unchanged = mtime <= row.last_scanned_time.timestamp()
-                except Exception:
-                    unchanged = False
+            rel_path = _join_rel(rel_dir, name)
+            if matcher.is_ignored(rel_path, False):
+                continue
+            yield _stat_file(os.path.join(dirpath, name), rel_path)
+
+
+def _join_rel(rel_dir: str, name: str) -> str:
+    return name if rel_dir == "." else f"{rel_dir}/{name}"
 
-            hashv = None
-            if not unchanged:
-                # 4) 条件哈希
-                if settings.SCAN_HASH and size is not None and size <= settings.SCAN_HASH_MAX_BYTES:
-                    hashv = _sha256_of_file(full_path)
 
-            upsert_file(
-                rel_path,
+def _list_dir(dirpath: str, rel_dir: str, matcher: IgnoreMatcher):
+    """列出单个目录并 stat 其中文件；语义与 os.walk 一致（目录软链接不下钻），
+    ignore 命中的文件不 stat、子目录不返回。"""
+    subdirs = []
+    files = []
+    try:
+        with os.scandir(dirpath) as it:
+            entries = list(it)
+    except OSError:
+        return rel_dir, None, None, matcher
+    matcher = matcher.child(dirpath, rel_dir, any(e.name == ".gitignore" for e in entries))
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        rel_path = _join_rel(rel_dir, entry.name)
+        if is_dir:
+            try:
+                is_link = entry.is_symlink()
+            except OSError:
+                is_link = False
+            if entry.name in settings.SCAN_IGNORE_DIRS or is_link or matcher.is_ignored(rel_path, True):
+                continue
+            subdirs.append(entry.name)
+        elif not matcher.is_ignored(rel_path, False):
+            files.append(_stat_file(entry.path, rel_path))
+    return rel_dir, subdirs, files, matcher
+
+
+def _walk_parallel(root_dir: Path, pool: ThreadPoolExecutor) -> Iterator[ScanEntry]:
+    """按目录扇出到线程池：每个目录一次 scandir + 文件 stat，结果与 _walk_serial 相同（顺序不同）。"""
+    pending = {pool.submit(_list_dir, str(root_dir), ".", IgnoreMatcher.for_root(root_dir))}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            rel_dir, subdirs, files, matcher = fut.result()
+            if subdirs is None:
+                continue
+            if rel_dir != ".":
+                yield ScanEntry(rel_dir, 1, None, None, None)
+            yield from files
+
+            depth = 0 if rel_dir == "." else rel_dir.count("/") + 1
+            if depth >= settings.SCAN_MAX_DEPTH:
+                continue
+            base = str(root_dir) if rel_dir == "." else os.path.join(str(root_dir), rel_dir)
+            for name in subdirs:
+                pending.add(pool.submit(_list_dir, os.path.join(base, name), _join_rel(rel_dir, name), matcher))
+
+
+def _tracked_dirs(index: Dict[str, GitIndexEntry]) -> Set[str]:
+    out: Set[str] = set()
+    for p in index:
+        i = p.rfind("/")
+        while i > 0:
+            d = p[:i]
+            if d in out:
+                break
+            out.add(d)
+            i = p.rfind("/", 0, i)
+    return out
+
+
+def _walk_git_index(root_dir: Path, index: Dict[str, GitIndexEntry], index_mtime_ns: Optional[int] = None) -> Iterator[ScanEntry]:
+    """git 索引模式：遍历与 stat 的工作量与 _walk_serial 相同（每个目录 scandir、每个文件 stat），并不更快；
+    唯一的收益是未修改的已跟踪文件带上 blob id，指纹变化（如重新 clone）时仍可按 blob id 命中哈希缓存、免于重新哈希。
+    已跟踪文件 stat 后与索引条目比较（与 git status 相同）：size 与 mtime 一致且不晚于索引写入时间时，
+    附带索引中的 blob id；不一致（已修改未 add）按未跟踪文件处理，缓存未命中时重新哈希。
+    已跟踪文件即使命中 .gitignore 也保留（git 仍在跟踪）。
+    """
+    tracked_dirs = _tracked_dirs(index)
+    stack = [(str(root_dir), ".", IgnoreMatcher.for_root(root_dir))]
+    while stack:
+        dirpath, rel_dir, matcher = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        if rel_dir != ".":
+            yield ScanEntry(rel_dir, 1, None, None, None)
+        matcher = matcher.child(dirpath, rel_dir, any(e.name == ".gitignore" for e in entries))
+
+        depth = 0 if rel_dir == "." else rel_dir.count("/") + 1
+        for entry in entries:
+            rel_path = _join_rel(rel_dir, entry.name)
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if (
+                    depth < settings.SCAN_MAX_DEPTH
+                    and entry.name not in settings.SCAN_IGNORE_DIRS
+                    and not entry.is_symlink()
+                    and (rel_path in tracked_dirs or not matcher.is_ignored(rel_path, True))
+                ):
+                    stack.append((entry.path, rel_path, matcher))
+                continue
+            ie = index.get(rel_path)
+            if ie is None:
+                if not matcher.is_ignored(rel_path, False):
+                    yield _stat_file(entry.path, rel_path)
+                continue
+            e = _stat_file(entry.path, rel_path)
+            if (
+                e.fp is not None
+                and e.size == ie.size
+                and e.fp[3] == ie.mtime_ns
+                and (index_mtime_ns is None or ie.mtime_ns < index_mtime_ns)
+            ):
+                yield e._replace(blob=ie.blob)
+            else:
+                yield e
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _apply_batch(
+    db: Session,
+    project_id: int,
+    batch: List[ScanEntry],
+    writer: FileBulkWriter,
+    cache: HashCache,
+    hash_map,
+) -> int:
+    """处理一个扫描批次，返回本批实际哈希的字节数。"""
+    # 现有索引按批次查询，峰值内存只与批次大小相关
+    existing = load_paths_index(db, project_id, (e.rel_path for e in batch))
+
+    # 增量 + 条件哈希：指纹 (dev, ino, size, mtime_ns) 未变则复用缓存哈希
+    hashes: Dict[str, str] = {}
+    bytes_hashed = 0
+    if settings.SCAN_HASH:
+        files = [e for e in batch if not e.is_dir and e.fp is not None and e.size <= settings.SCAN_HASH_MAX_BYTES]
+        cache.load(e.rel_path for e in files)
+        to_hash = []
+        for e in files:
+            cached = cache.get(e.rel_path, e.fp, e.blob)
+            if cached:
+                hashes[e.rel_path] = cached
+            else:
+                to_hash.append(e)
+        for e, hashv in zip(to_hash, hash_map(_sha256_of_file, [Path(e.full_path) for e in to_hash])):
+            if hashv:
+                hashes[e.rel_path] = hashv
+                cache.put(e.rel_path, e.fp, hashv, e.blob)
+                bytes_hashed += e.size
+        cache.flush()
+
+    for e in batch:
+        parent = os.path.dirname(e.rel_path) or None
+        if e.is_dir:
+            # 目录摘要在遍历结束后统一写回，此处保留原值
+            row = existing.get((e.rel_path, 1))
+            writer.upsert(row, e.rel_path, 1, None, None, None, parent, row.digest if row else None)
+        else:
+            row = existing.get((e.rel_path, 0))
+            hashv = hashes.get(e.rel_path) or (row.hash_sha256 if row else None)
+            digest = leaf_digest(hashv, e.fp)
+            writer.upsert(
+                row,
+                e.rel_path,
                 0,
-                size_bytes=size,
-                hash_sha256=hashv if hashv else (row.hash_sha256 if row else None),
-                lang=lang,
-                parent_path=parent if parent else None,
-                last_scanned_time=now,
+                e.size,
+                hashv,
+                LANG_EXT.get(os.path.splitext(e.rel_path)[1].lower()),
+                parent,
+                digest,
             )
-            count += 1
-
+    return bytes_hashed
+
+
+def scan_workspace(
+    db: Session,
+    project_id: int,
+    root: Optional[str] = None,
+    parallel: Optional[bool] = None,
+    stats: Optional[Dict[str, int]] = None,
+    git: Optional[bool] = None,
+) -> int:
+    """递归扫描工作区并写入 files 索引。
+    parallel=None 时取 settings.SCAN_PARALLEL；并行模式下目录遍历、stat 与哈希在
+    SCAN_WORKERS 个线程中进行，写库仍在当前线程。
+    git=None 时取 settings.SCAN_GIT_INDEX；工作区为 git 仓库时额外读 .git/index，
+    为未修改的已跟踪文件附带 blob id 以命中哈希缓存（遍历本身不减少）；无可用索引时回退为普通遍历。
+    stats 若传入，按批次实时累加 dirs / files / bytes_hashed / rows_written / hash_hits / hash_misses
+    （后台扫描任务据此汇报进度）。
+    """
+    root_dir = Path(root or settings.WORKSPACE_ROOT)
+    now = datetime.utcnow()
+    if parallel is None:
+        parallel = settings.SCAN_PARALLEL
+    if git is None:
+        git = settings.SCAN_GIT_INDEX
+    git_index = read_git_index(root_dir) if git else None
+    index_mtime_ns = git_index_mtime_ns(root_dir) if git_index is not None else None
+
+    writer = FileBulkWriter(db, project_id, now)
+    cache = HashCache(db, project_id)
+    if stats is None:
+        stats = {}
+    for k in ("dirs", "files", "bytes_hashed", "rows_written", "hash_hits", "hash_misses"):
+        stats[k] = 0
+
+    def apply_entries(entries: Iterable[ScanEntry], hash_map) -> int:
+        count = 0
+        for batch in _batched(entries, settings.SCAN_BATCH_SIZE):
+            stats["bytes_hashed"] += _apply_batch(db, project_id, batch, writer, cache, hash_map)
+            dirs = sum(e.is_dir for e in batch)
+            stats["dirs"] += dirs
+            stats["files"] += len(batch) - dirs
+            stats["rows_written"] = writer.written
+            stats["hash_hits"] = cache.hits
+            stats["hash_misses"] = cache.misses
+            count += len(batch)
+        return count
+
+    if git_index is not None:
+        if parallel:
+            with ThreadPoolExecutor(max_workers=max(1, settings.SCAN_WORKERS)) as pool:
+                count = apply_entries(_walk_git_index(root_dir, git_index, index_mtime_ns), pool.map)
+        else:
+            count = apply_entries(_walk_git_index(root_dir, git_index, index_mtime_ns), map)
+    elif parallel:
+        with ThreadPoolExecutor(max_workers=max(1, settings.SCAN_WORKERS)) as pool:
+            count = apply_entries(_walk_parallel(root_dir, pool), pool.map)
+    else:
+        count = apply_entries(_walk_serial(root_dir), map)
+
+    writer.flush()
+    # 目录 Merkle 摘要：由写入后的 files 行自底向上合成（与单层刷新同源），只写回变化的目录行
+    dir_written = write_dir_digests(db, project_id, compute_dir_digests(db, project_id))
+    scan_generation = next_scan_generation(db, project_id) if writer.new_parents else None
     db.commit()
+    mark_tree_dirty(project_id, writer.new_parents, scan_generation)
+    notify_files_added(project_id, writer.new_files, scan_generation)
+    stats["rows_written"] = writer.written + dir_written
     return count
 
 
-def infer_deps(db: Session, project_id: int, paths: Optional[List[str]] = None) -> List[Dict]:
+def infer_deps(
+    db: Session,
+    project_id: int,
+    paths: Optional[List[str]] = None,
+    stats: Optional[Dict[str, int]] = None,
+    parallel: Optional[bool] = None,
+) -> List[Dict]:
+    """iter_infer_deps 的列表版本。"""
+    return list(iter_infer_deps(db, project_id, paths, stats, parallel))
+
+
+def iter_infer_deps(
+    db: Session,
+    project_id: int,
+    paths: Optional[List[str]] = None,
+    stats: Optional[Dict[str, int]] = None,
+    parallel: Optional[bool] = None,
+) -> Iterator[Dict]:
     """最小可用的静态依赖推断：Python/TS/JS 简单 import/require 扫描。
-    返回: [ {"src","dst","dep_type","inferred_by","confidence"}, ... ]
+    每个文件提取出的 import 缓存在 file_imports（按指纹/内容哈希），未变化的文件不再读取与解析，
+    只重新做路径解析（文件集合可能变化）。结果按源文件写入 file_edges（边集合未变的源文件不写）。
+    stats 若传入，写入 files / hits / misses / sources_replaced / edges_written / generation。
+    parallel=None 时取 settings.DEPS_PARALLEL；并行模式下未命中缓存的文件分组交给进程池读取与解析，
+    结果与串行一致。
+    按批产出边 {"src","dst","dep_type","inferred_by","confidence"}（不在内存中累积全部结果）；
+    每批先写入 file_edges / file_imports 并提交、通知内存依赖图，再产出该批的边，
+    因此调用方消费结果（如慢速的流式客户端）期间不持有事务与行锁；中途放弃迭代时已产出的批次均已持久化。
+    stats 只在迭代结束后写入。
     """
     root_dir = Path(settings.WORKSPACE_ROOT)
-    # 收集候选文件
-    q = db.query(File).filter(File.project_id == project_id, File.is_deleted == 0, File.is_dir == 0)
+    # 收集候选文件（只取 path/lang 两列）
+    stmt = select(File.path, File.lang).where(File.project_id == project_id, File.is_deleted == 0, File.is_dir == 0)
     if paths:
         norm = {p.replace("\\", "/") for p in paths}
-        q = q.filter(File.path.in_(list(norm)))
-    files = q.all()
-
-    # 建索引以便路径解析
-    all_files = db.query(File).filter(File.project_id == project_id, File.is_deleted == 0, File.is_dir == 0).all()
-    file_set = {f.path for f in all_files}
-
-    deps: List[Dict] = []
-
-    # JS/TS import 解析
-    import_re = re.compile(r"^\s*import\s+.*?from\s+['\"](.*?)['\"];?", re.MULTILINE)
-    require_re = re.compile(r"require\(['\"](.*?)['\"]\)")
-
-    def resolve_module_to_path(src_path: str, mod: str, lang: str) -> Optional[str]:
-        # 仅解析本地相对路径
-        if mod.startswith("."):
-            src_parent = os.path.dirname(src_path)
-            rel = os.path.normpath(os.path.join(src_parent, mod)).replace("\\", "/")
-            candidates = []
-            if lang in ("js", "ts"):
-                for ext in (".ts", ".tsx", ".js", ".jsx", ".d.ts"):
-                    candidates.append(rel + ext)
-                candidates.append(rel + "/index.ts")
-                candidates.append(rel + "/index.js")
-            elif lang == "python":
-                candidates.append(rel + ".py")
-                candidates.append(rel + "/__init__.py")
-            for c in candidates:
-                if c in file_set:
-                    return c
-        else:
-            # python 包形式 a.b.c -> a/b/c.py 或 __init__.py
-            if lang == "python":
-                as_path = mod.replace(".", "/")
-                for c in (as_path + ".py", as_path + "/__init__.py"):
-                    if c in file_set:
-                        return c
-        return None
-
-    for f in files:
-        src = f.path
-        full_path = root_dir / src
-        lang = f.lang or Path(src).suffix.lower().lstrip(".")
-        try:
-            text = full_path.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-
-        if lang == "python":
+        stmt = stmt.where(File.path.in_(list(norm)))
+    files = db.execute(stmt).all()
+
+    # 模块解析索引（按项目缓存，扫描时增量追加），每条 import 的解析为常数次查表
+    index = get_module_index(db, project_id, root_dir)
+
+    if parallel is None:
+        parallel = settings.DEPS_PARALLEL
+    header_only = settings.DEPS_JS_HEADER_ONLY
+    cache = ImportCache(db, project_id, extractor_version(header_only))
+    edge_writer = FileEdgeWriter(db, project_id)
+    for batch in _batched(files, settings.SCAN_BATCH_SIZE):
+        todo = []
+        for f in batch:
+            lang = f.lang or os.path.splitext(f.path)[1].lower().lstrip(".")
+            # 只有 Python/TS/JS 会产生依赖，其余文件不必读取
+            if lang in ("python", "ts", "js"):
+                todo.append((f.path, lang))
+        cache.load(p for p, _ in todo)
+
+        # 1) 指纹命中直接取缓存；其余交给 read_and_extract（内容哈希未变时不解析）
+        resolved: Dict[str, list] = {}
+        misses = []
+        for src, lang in todo:
             try:
-                tree = ast.parse(text)
-            except Exception:
-                tree = None
-            if tree:
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Import):
-                        for n in node.names:
-                            dst = resolve_module_to_path(src, n.name, "python")
-                            if dst:
-                                deps.append({
-                                    "src": src,
-                                    "dst": dst,
-                                    "dep_type": "import",
-                                    "inferred_by": "static",
-                                    "confidence": 0.9,
-                                })
-                    elif isinstance(node, ast.ImportFrom):
-                        mod = node.module or ""
-                        # 相对 from ... import ... 不处理级数，作为同目录近似
-                        if node.level and not mod:
-                            mod = "."
-                        dst = resolve_module_to_path(src, mod, "python")
-                        if dst:
-                            deps.append({
-                                "src": src,
-                                "dst": dst,
-                                "dep_type": "import",
-                                "inferred_by": "static",
-                                "confidence": 0.85,
-                            })
-        elif lang in ("ts", "js"):
-            for m in import_re.findall(text) + require_re.findall(text):
-                dst = resolve_module_to_path(src, m, "ts")
-                if dst:
-                    deps.append({
+                fp = _fingerprint(os.stat(root_dir / src))
+            except OSError:
+                # 文件已不存在：记为无依赖，清除其已存储的边
+                resolved[src] = []
+                continue
+            imports = cache.get(src, fp)
+            if imports is not None:
+                resolved[src] = imports
+            else:
+                misses.append((src, fp, (str(root_dir / src), lang, cache.cached_hash(src), header_only)))
+        tasks = [t for _, _, t in misses]
+        if parallel and len(tasks) >= settings.DEPS_PARALLEL_MIN_FILES:
+            results = extract_many(tasks, max(1, settings.DEPS_WORKERS), max(1, settings.DEPS_CHUNK_SIZE))
+        else:
+            results = [read_and_extract(*t) for t in tasks]
+        for (src, fp, _), res in zip(misses, results):
+            if res is None:
+                resolved[src] = []
+                continue
+            hashv, imports = res
+            cached = cache.get_by_hash(src, fp, hashv)
+            if cached is not None:
+                imports = cached
+            else:
+                cache.put(src, fp, hashv, imports)
+            resolved[src] = imports
+
+        # 2) 按原顺序解析为路径（同一文件指向同一目标只记一次）
+        edges_by_src: Dict[str, List[Dict]] = {}
+        for src, _ in todo:
+            if src not in resolved:
+                continue
+            seen = set()
+            out = edges_by_src[src] = []
+            for mod, rlang, confidence, names in resolved[src]:
+                for dst in index.resolve(src, mod, rlang, names):
+                    if dst in seen or dst == src:
+                        continue
+                    seen.add(dst)
+                    out.append({
                         "src": src,
                         "dst": dst,
                         "dep_type": "import",
                         "inferred_by": "static",
-                        "confidence": 0.85,
+                        "confidence": confidence,
                     })
+        cache.flush()
+        # 3) 持久化到 file_edges（只替换边集合有变化的源文件），逐批提交后再交给调用方
+        changed = edge_writer.replace(edges_by_src)
+        db.commit()
+        if changed:
+            notify_edges_changed(project_id, changed, edge_writer.generation)
+        for out in edges_by_src.values():
+            yield from out
+
+    if stats is not None:
+        stats["files"] = cache.hits + cache.misses
+        stats["hits"] = cache.hits
+        stats["misses"] = cache.misses
+        stats["sources_replaced"] = edge_writer.sources_replaced
+        stats["edges_written"] = edge_writer.edges_written
+        stats["generation"] = edge_writer.generation or current_generation(db, project_id)
+
+
+class _Flight:
+    def __init__(self, force: bool) -> None:
+        self.force = force
+        self.done = threading.Event()
+        self.result = 0
 
-    return deps
 
+_flights: Dict[tuple, _Flight] = {}
+_flights_lock = threading.Lock()
 
-def scan_one_level(db: Session, project_id: int, parent: Optional[str], root: Optional[str] = None) -> int:
+
+def scan_one_level(db: Session, project_id: int, parent: Optional[str], root: Optional[str] = None, force: bool = False) -> int:
     """只刷新指定 parent 目录的直接子项（不递归）。
     parent=None 表示工作区根目录的第一层。
-    返回更新/插入条目数量。
+    返回更新/插入条目数量；目录自身指纹（mtime 等）未变化时跳过并返回 0，force=True 强制刷新。
+    同一 (project_id, parent) 的并发调用合并为一次扫描（single-flight），其余调用等待并共享结果；
+    force=True 的调用遇到进行中的非强制扫描时，等它结束后再自己扫描一次（非强制扫描可能已跳过）。
     """
+    key = (project_id, parent, str(root or settings.WORKSPACE_ROOT))
+    while True:
+        with _flights_lock:
+            flight = _flights.get(key)
+            if flight is None:
+                flight = _flights[key] = _Flight(force)
+                break
+        flight.done.wait()
+        if flight.force or not force:
+            return flight.result
+    try:
+        flight.result = _scan_one_level(db, project_id, parent, root, force)
+        return flight.result
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _scan_one_level(db: Session, project_id: int, parent: Optional[str], root: Optional[str], force: bool) -> int:
     root_dir = Path(root or settings.WORKSPACE_ROOT)
     if parent and (parent.startswith("../") or parent.startswith("..\\")):
         # 简单防御，避免越界
         return 0
 
     base_path = root_dir if parent is None else (root_dir / parent)
-    if not base_path.exists() or not base_path.is_dir():
+    try:
+        dir_st = os.stat(base_path)
+    except OSError:
+        return 0
+    if not stat.S_ISDIR(dir_st.st_mode):
         return 0
 
-    # 现有索引
-    existing = {
-        (r.path, int(r.is_dir)): r
-        for r in db.query(File).filter(File.project_id == project_id, File.is_deleted == 0).all()
-    }
-
-    def upsert_file(path: str, is_dir: int, **fields):
-        key = (path, is_dir)
-        row = existing.get(key)
-        if row is None:
-            row = File(
-                id=generate_id(),
-                str_id=None,
-                is_deleted=0,
-                create_user_id=0,
-                project_id=project_id,
-                path=path,
-                is_dir=is_dir,
-            )
-            existing[key] = row
-            db.add(row)
-        for k, v in fields.items():
-            setattr(row, k, v)
-
-    now = datetime.utcnow()
-    changed = 0
+    # 目录指纹短路：仅一次 stat + 一次索引查询。注意目录 mtime 只反映直接子项的增删改名，
+    # 子文件内容变化需由全量扫描或后台监听（force=True）刷新
+    dir_key = parent or "."
+    dir_fp = _fingerprint(dir_st)
+    dir_row = load_dir_fingerprint(db, project_id, dir_key)
+    if not force and dir_row is not None and (dir_row.st_dev, dir_row.st_ino, dir_row.size_bytes, dir_row.mtime_ns) == dir_fp:
+        return 0
 
+    matcher = matcher_for_dir(root_dir, parent)
+    entries: List[ScanEntry] = []
     try:
         with os.scandir(base_path) as it:
             for entry in it:
@@ -287,56 +551,35 @@ def scan_one_level(db: Session, project_id: int, parent: Optional[str], root: Op
                     continue
 
                 rel_path = (Path(parent) / name).as_posix() if parent else name
+                if matcher.is_ignored(rel_path, entry.is_dir()):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append(ScanEntry(rel_path, 1, None, None, None))
+                    continue
                 try:
                     st = entry.stat()
                     size = None if entry.is_dir() else st.st_size
-                    mtime = st.st_mtime
+                    fp = None if size is None else _fingerprint(st)
                 except Exception:
                     size = None
-                    mtime = None
-
-                if entry.is_dir(follow_symlinks=False):
-                    upsert_file(
-                        rel_path,
-                        1,
-                        size_bytes=None,
-                        hash_sha256=None,
-                        lang=None,
-                        parent_path=parent,
-                        last_scanned_time=now,
-                    )
-                    changed += 1
-                else:
-                    ext = Path(name).suffix.lower()
-                    lang = LANG_EXT.get(ext)
-                    row = existing.get((rel_path, 0))
-                    unchanged = False
-                    if row is not None and size is not None and mtime is not None and row.size_bytes == size and row.last_scanned_time:
-                        try:
-                            unchanged = mtime <= row.last_scanned_time.timestamp()
-                        except Exception:
-                            unchanged = False
-                    hashv = None
-                    if not unchanged and settings.SCAN_HASH and size is not None and size <= settings.SCAN_HASH_MAX_BYTES:
-                        try:
-                            hashv = _sha256_of_file(Path(entry.path))
-                        except Exception:
-                            hashv = None
-
-                    upsert_file(
-                        rel_path,
-                        0,
-                        size_bytes=size,
-                        hash_sha256=hashv if hashv else (row.hash_sha256 if row else None),
-                        lang=lang,
-                        parent_path=parent,
-                        last_scanned_time=now,
-                    )
-                    changed += 1
+                    fp = None
+                entries.append(ScanEntry(rel_path, 0, size, fp, entry.path))
     except Exception:
         pass
 
+    writer = FileBulkWriter(db, project_id, datetime.utcnow())
+    cache = HashCache(db, project_id)
+    for batch in _batched(entries, settings.SCAN_BATCH_SIZE):
+        _apply_batch(db, project_id, batch, writer, cache, map)
+    writer.flush()
+    if writer.written:
+        # 子项有变化：沿祖先链更新目录摘要（未变化的一级即停止）
+        refresh_ancestor_digests(db, project_id, parent)
+    # 记录扫描前取得的目录指纹：扫描期间若有变化，下次比对不一致会再扫
+    save_dir_fingerprint(db, project_id, dir_key, dir_fp, dir_row)
+    # 有新增行时推进 scan_generation，其他进程的文件树 / 解析索引缓存据此失效
+    scan_generation = next_scan_generation(db, project_id) if writer.new_parents else None
     db.commit()
-    return changed
-
-
+    mark_tree_dirty(project_id, writer.new_parents, scan_generation)
+    notify_files_added(project_id, writer.new_files, scan_generation)
+    return len(entries)
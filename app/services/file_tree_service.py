@@ -0,0 +1,149 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.db.models.file import File
+from app.services.file_bulk_service import current_scan_generation, local_writes_cover
+
+
+# 脏父目录超过该数量时整棵重建，比逐个补丁更快
+_FULL_REBUILD_DIRTY = 256
+
+
+def _depth(path: str) -> int:
+    return path.count("/")
+
+
+def _name(path: str) -> str:
+    return path.rsplit("/", 1)[-1]
+
+
+class _ProjectTree:
+    """单个项目的物化文件树：
+    - kids：parent_path -> 有序子项 [(is_dir, path)]（目录在前、按 path 升序，与原接口一致）；
+    - frags：目录节点已序列化的 JSON 片段，子树未变化时直接复用；
+    - body/etag：整棵树的响应体与 ETag。
+    每次读取与 projects.scan_generation 比对：之后的写入都来自本进程的扫描时只重载脏父目录并沿祖先链重拼片段，
+    否则（其他进程写入）整棵重建。
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.built_generation: Optional[int] = None
+        # 本进程扫描分配的 scan_generation
+        self.local: Set[int] = set()
+        self.dirty: Set[Optional[str]] = set()
+        self.kids: Dict[Optional[str], List[Tuple[int, str]]] = {}
+        self.frags: Dict[str, str] = {}
+        self.body = b""
+        self.etag = ""
+
+    # ---- 构建 ----
+    def rebuild(self, db: Session, project_id: int) -> None:
+        stmt = select(File.path, File.is_dir, File.parent_path).where(
+            File.project_id == project_id,
+            File.is_deleted == 0,
+        )
+        kids: Dict[Optional[str], List[Tuple[int, str]]] = {}
+        for r in db.execute(stmt):
+            kids.setdefault(r.parent_path, []).append((1 if r.is_dir else 0, r.path))
+        for arr in kids.values():
+            arr.sort(key=lambda x: (-x[0], x[1]))
+        self.kids = kids
+        self.frags = {}
+        dirs = [p for arr in kids.values() for is_dir, p in arr if is_dir]
+        self._render(dirs)
+
+    def patch(self, db: Session, project_id: int, parents: Set[Optional[str]]) -> None:
+        named = [p for p in parents if p is not None]
+        conds = []
+        if named:
+            conds.append(File.parent_path.in_(named))
+        if None in parents:
+            conds.append(File.parent_path == None)  # noqa: E711
+        stmt = select(File.path, File.is_dir, File.parent_path).where(
+            File.project_id == project_id,
+            File.is_deleted == 0,
+            or_(*conds),
+        )
+        fresh: Dict[Optional[str], List[Tuple[int, str]]] = {p: [] for p in parents}
+        for r in db.execute(stmt):
+            fresh[r.parent_path].append((1 if r.is_dir else 0, r.path))
+        for p, arr in fresh.items():
+            arr.sort(key=lambda x: (-x[0], x[1]))
+            self.kids[p] = arr
+
+        # 受影响的目录：脏目录本身及其全部祖先（根由 body 单独拼接）
+        affected: Set[str] = set()
+        for p in named:
+            while p and p not in affected:
+                affected.add(p)
+                p = p.rsplit("/", 1)[0] if "/" in p else None
+        self._render(affected)
+
+    def _render(self, dirs: Iterable[str]) -> None:
+        # 按深度由深到浅拼接片段（显式排序代替递归，深层路径不受递归深度限制）
+        for d in sorted(dirs, key=_depth, reverse=True):
+            self.frags.pop(d, None)
+            self.frags[d] = self._node(1, d)
+        body = '{"tree":[' + ",".join(self._node(is_dir, p) for is_dir, p in self.kids.get(None, ())) + "]}"
+        self.body = body.encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+    def _node(self, is_dir: int, path: str) -> str:
+        if is_dir:
+            frag = self.frags.get(path)
+            if frag is not None:
+                return frag
+        head = '{"id":' + json.dumps(path) + ',"name":' + json.dumps(_name(path))
+        if is_dir:
+            children = self.kids.get(path)
+            if children:
+                return head + ',"children":[' + ",".join(self._node(c, p) for c, p in children) + "]}"
+        return head + "}"
+
+
+_trees: Dict[int, _ProjectTree] = {}
+_trees_lock = threading.Lock()
+
+
+def mark_tree_dirty(project_id: int, parents: Iterable[Optional[str]], generation: Optional[int]) -> None:
+    """扫描提交后调用：parents 为新增行的 parent_path 集合（None 为根层），generation 为本次分配的 scan_generation。"""
+    parents = set(parents)
+    if not parents:
+        return
+    with _trees_lock:
+        tree = _trees.get(project_id)
+    if tree is None:
+        return
+    with tree.lock:
+        tree.dirty |= parents
+        if generation is not None:
+            tree.local.add(generation)
+
+
+def get_file_tree_cached(db: Session, project_id: int) -> Tuple[str, bytes]:
+    """返回 (etag, JSON 响应体)；未变化时只是一次版本查询与字典查找。"""
+    generation = current_scan_generation(db, project_id)
+    with _trees_lock:
+        tree = _trees.get(project_id)
+        if tree is None:
+            tree = _trees[project_id] = _ProjectTree()
+    with tree.lock:
+        if tree.built_generation != generation or tree.dirty:
+            dirty, tree.dirty = tree.dirty, set()
+            if (
+                tree.built_generation is None
+                or len(dirty) > _FULL_REBUILD_DIRTY
+                or not local_writes_cover(tree.built_generation, generation, tree.local)
+            ):
+                tree.rebuild(db, project_id)
+            else:
+                tree.patch(db, project_id, dirty)
+            tree.built_generation = generation
+            tree.local = {v for v in tree.local if v > generation}
+        return tree.etag, tree.body
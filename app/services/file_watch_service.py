@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.file_scan_service import scan_one_level
+
+try:  # 可选依赖：pip install watchdog（底层 Linux 为 inotify）
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    FileSystemEventHandler = object
+    Observer = None
+
+
+_ROOT = object()  # 工作区根目录（parent=None）在集合中的占位
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "WorkspaceWatcher") -> None:
+        self.watcher = watcher
+
+    def on_any_event(self, event) -> None:
+        for attr in ("src_path", "dest_path"):
+            p = getattr(event, attr, None)
+            if p:
+                self.watcher.notify(os.fsdecode(p))
+
+
+class WorkspaceWatcher:
+    """工作区后台监听：
+    - 事件源优先 watchdog（inotify/FSEvents/ReadDirectoryChangesW），不可用时轮询目录签名；
+    - 事件合并为“脏目录”集合，每 SCAN_WATCH_DEBOUNCE_MS 批量调用 scan_one_level 更新索引；
+    - 只维护已同步过（被 list_files 刷新过一次）的目录，未同步目录首次列出时仍会刷新。
+    """
+
+    def __init__(self, project_id: int, root: Optional[str] = None, backend: Optional[str] = None) -> None:
+        self.project_id = project_id
+        self.root = Path(root or settings.WORKSPACE_ROOT).resolve()
+        backend = backend or settings.SCAN_WATCH_BACKEND
+        if backend == "auto":
+            backend = "watchdog" if Observer is not None else "poll"
+        self.backend = backend
+        self.error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._synced: Set[object] = set()
+        self._dirty: Set[object] = set()
+        self._signatures: Dict[object, str] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    # ---- 生命周期 ----
+    def start(self) -> None:
+        if self.backend == "watchdog":
+            if Observer is None:
+                raise RuntimeError("watchdog is not installed")
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.root), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.project_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def healthy(self) -> bool:
+        if self.error or self._stop.is_set() or self._thread is None or not self._thread.is_alive():
+            return False
+        if self._observer is not None and not self._observer.is_alive():
+            return False
+        return True
+
+    # ---- 同步状态 ----
+    def is_synced(self, parent: Optional[str]) -> bool:
+        key = _ROOT if parent is None else parent
+        with self._lock:
+            return key in self._synced and key not in self._dirty
+
+    def mark_synced(self, parent: Optional[str]) -> None:
+        """在刷新目录之前调用：刷新期间到达的事件会再次标脏，不会丢失。"""
+        with self._lock:
+            self._synced.add(_ROOT if parent is None else parent)
+
+    def notify(self, abs_path: str) -> None:
+        rel = os.path.relpath(abs_path, self.root).replace("\\", "/")
+        if rel == "." or rel == ".." or rel.startswith("../"):
+            return
+        parts = rel.split("/")
+        if any(p in settings.SCAN_IGNORE_DIRS for p in parts):
+            return
+        parent = "/".join(parts[:-1]) or None
+        key = _ROOT if parent is None else parent
+        with self._lock:
+            if key in self._synced:
+                self._dirty.add(key)
+        self._wake.set()
+
+    # ---- 后台线程 ----
+    def _run(self) -> None:
+        debounce = settings.SCAN_WATCH_DEBOUNCE_MS / 1000.0
+        while not self._stop.is_set():
+            if self.backend == "poll":
+                self._stop.wait(settings.SCAN_WATCH_POLL_SECONDS)
+                self._poll()
+            else:
+                self._wake.wait()
+                self._wake.clear()
+                # 合并短时间内的事件风暴
+                self._stop.wait(debounce)
+            try:
+                self._flush()
+            except Exception as exc:
+                self.error = repr(exc)
+                return
+
+    def _poll(self) -> None:
+        with self._lock:
+            synced = list(self._synced)
+        for key in synced:
+            sig = self._signature(None if key is _ROOT else key)
+            old = self._signatures.get(key)
+            self._signatures[key] = sig
+            # 首次取签名时无法确定同步后是否有变化，保守地再刷新一次
+            if old != sig:
+                with self._lock:
+                    self._dirty.add(key)
+
+    def _signature(self, parent: Optional[str]) -> str:
+        base = self.root if parent is None else self.root / parent
+        h = hashlib.sha1()
+        try:
+            with os.scandir(base) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        h.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+                    except OSError:
+                        h.update(f"{entry.name}\0?\n".encode("utf-8", "surrogateescape"))
+        except OSError:
+            return "missing"
+        return h.hexdigest()
+
+    def _flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        db = SessionLocal()
+        try:
+            for key in dirty:
+                scan_one_level(db, self.project_id, None if key is _ROOT else key, str(self.root), force=True)
+        finally:
+            db.close()
+
+
+_watchers: Dict[int, WorkspaceWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def ensure_watcher(project_id: int) -> Optional[WorkspaceWatcher]:
+    """SCAN_WATCH=true 时为项目启动（或复用）监听器；启动失败返回 None，调用方回退为读时刷新。"""
+    if not settings.SCAN_WATCH:
+        return None
+    with _watchers_lock:
+        w = _watchers.get(project_id)
+        if w is not None and w.healthy:
+            return w
+        if w is not None:
+            w.stop()
+        w = WorkspaceWatcher(project_id)
+        try:
+            w.start()
+        except Exception:
+            _watchers.pop(project_id, None)
+            return None
+        _watchers[project_id] = w
+        return w
+
+
+def stop_all_watchers() -> None:
+    with _watchers_lock:
+        for w in _watchers.values():
+            w.stop()
+        _watchers.clear()
@@ -0,0 +1,117 @@
+import os
+import struct
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+
+class GitIndexEntry(NamedTuple):
+    path: str
+    mode: int
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+    blob: str
+
+
+_ENTRY_HEAD = struct.Struct(">10I20sH")  # ctime/mtime/dev/ino/mode/uid/gid/size + sha1 + flags
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_XFLAG_SKIP_WORKTREE = 0x4000
+_XFLAG_INTENT_TO_ADD = 0x2000
+
+_MODE_TYPE_MASK = 0o170000
+_MODE_REGULAR = 0o100000
+
+
+def find_git_dir(root: Path) -> Optional[Path]:
+    """定位 root 下的 .git 目录；支持 worktree/submodule 的 `gitdir: <path>` 文件形式。"""
+    dot_git = root / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    if dot_git.is_file():
+        try:
+            line = dot_git.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        if line.startswith("gitdir:"):
+            p = Path(line[len("gitdir:"):].strip())
+            return p if p.is_absolute() else (root / p).resolve()
+    return None
+
+
+def git_index_mtime_ns(root: Path) -> Optional[int]:
+    """.git/index 的修改时间；用于识别 racily clean 的条目（文件 mtime 不早于索引写入时间）。"""
+    git_dir = find_git_dir(root)
+    if git_dir is None:
+        return None
+    try:
+        return os.stat(git_dir / "index").st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_varint(data: bytes, pos: int):
+    # git index v4 的路径前缀长度编码（offset varint）
+    b = data[pos]
+    pos += 1
+    value = b & 0x7F
+    while b & 0x80:
+        b = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (b & 0x7F)
+    return value, pos
+
+
+def read_git_index(root: Path) -> Optional[Dict[str, GitIndexEntry]]:
+    """直接解析 .git/index（版本 2/3/4），不依赖 git 可执行文件。
+    只返回工作区中存在的普通文件（stage 0、非 skip-worktree / intent-to-add、非软链接/子模块）。
+    索引中 dev/ino/size 为 32 位截断值。无索引或格式不支持时返回 None。
+    """
+    git_dir = find_git_dir(root)
+    if git_dir is None:
+        return None
+    try:
+        with open(git_dir / "index", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < 12 or data[:4] != b"DIRC":
+        return None
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        return None
+
+    entries: Dict[str, GitIndexEntry] = {}
+    pos = 12
+    prev_path = b""
+    try:
+        for _ in range(count):
+            start = pos
+            (_, _, mtime_s, mtime_ns, dev, ino, mode, _, _, size, sha, flags) = _ENTRY_HEAD.unpack_from(data, pos)
+            pos += _ENTRY_HEAD.size
+            xflags = 0
+            if flags & _FLAG_EXTENDED and version >= 3:
+                (xflags,) = struct.unpack_from(">H", data, pos)
+                pos += 2
+            if version == 4:
+                strip, pos = _read_varint(data, pos)
+                end = data.index(b"\0", pos)
+                path = prev_path[: len(prev_path) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b"\0", pos)
+                path = data[pos:end]
+                # 条目按 8 字节对齐，至少 1 个 NUL
+                pos = start + ((end - start + 8) & ~7)
+            prev_path = path
+
+            if flags & _FLAG_STAGE or xflags & (_XFLAG_SKIP_WORKTREE | _XFLAG_INTENT_TO_ADD):
+                continue
+            if mode & _MODE_TYPE_MASK != _MODE_REGULAR:
+                continue
+            p = os.fsdecode(path)
+            entries[p] = GitIndexEntry(p, mode, dev, ino, size, mtime_s * 1_000_000_000 + mtime_ns, sha.hex())
+    except (struct.error, ValueError, IndexError):
+        return None
+    return entries
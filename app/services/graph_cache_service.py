@@ -0,0 +1,225 @@
+"""GET /graph 快照缓存：缓存序列化后的 JSON 字节，键为 (project_id, graph_version)。
+版本号随每次图谱写入在同一事务内递增，命中时版本必然一致，不会返回旧数据；
+写入方提交后调用 invalidate_graph_snapshot 只是尽早释放空间。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class MemorySnapshotBackend:
+    """进程内 LRU：按总字节数限额，超限时淘汰最久未访问的项目。每个项目只保留一个版本。"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[int, Tuple[int, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, project_id: int, version: int) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(project_id)
+            if item is None or item[0] != version:
+                return None
+            self._items.move_to_end(project_id)
+            return item[1]
+
+    def put(self, project_id: int, version: int, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(project_id, None)
+            if old is not None:
+                if old[0] > version:
+                    # 并发请求中较慢的一个带着旧版本回来，不覆盖新版本
+                    self._items[project_id] = old
+                    return
+                self._bytes -= len(old[1])
+            self._items[project_id] = (version, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (_, dropped) = self._items.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def invalidate(self, project_id: int) -> None:
+        with self._lock:
+            old = self._items.pop(project_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class FileSnapshotBackend:
+    """目录存储：{project_id}-{version}.json，写临时文件后 os.replace 原子替换，多个 worker 进程共享。
+    按文件修改时间近似 LRU（命中时刷新 mtime），总大小超过 max_bytes 时删除最旧的文件。
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, project_id: int, version: int) -> str:
+        return os.path.join(self.root, f"{project_id}-{version}.json")
+
+    def _project_files(self, project_id: int) -> List[Tuple[int, str]]:
+        """该项目现有的 (version, 文件名)。"""
+        prefix = f"{project_id}-"
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        out = []
+        for n in names:
+            if n.startswith(prefix) and n.endswith(".json"):
+                try:
+                    out.append((int(n[len(prefix):-len(".json")]), n))
+                except ValueError:
+                    continue
+        return out
+
+    def get(self, project_id: int, version: int) -> Optional[bytes]:
+        path = self._path(project_id, version)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return body
+
+    def put(self, project_id: int, version: int, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        existing = self._project_files(project_id)
+        if any(v > version for v, _ in existing):
+            # 并发请求中较慢的一个带着旧版本回来，不覆盖新版本
+            return
+        path = self._path(project_id, version)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        # 只删除更旧的版本：写入期间若已有更新的版本落盘，保留它
+        for v, name in existing:
+            if v < version:
+                self._remove(name)
+        self._trim()
+
+    def _remove(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, name))
+        except OSError:
+            pass
+
+    def _scan(self):
+        out = []
+        try:
+            with os.scandir(self.root) as it:
+                for e in it:
+                    if e.name.endswith(".json"):
+                        try:
+                            st = e.stat()
+                        except OSError:
+                            continue
+                        out.append((st.st_mtime, st.st_size, e.name))
+        except OSError:
+            pass
+        return out
+
+    def _trim(self) -> None:
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        for _, size, name in sorted(files):
+            self._remove(name)
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, project_id: int) -> None:
+        for _, name in self._project_files(project_id):
+            self._remove(name)
+
+    def usage(self) -> Dict[str, int]:
+        files = self._scan()
+        return {"entries": len(files), "bytes": sum(size for _, size, _ in files), "evictions": self.evictions}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# 计数为本进程内的请求（file 后端下各 worker 分别统计）
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = settings.GRAPH_CACHE_BACKEND.lower()
+            if kind == "file":
+                _backend = FileSnapshotBackend(settings.GRAPH_CACHE_DIR, settings.GRAPH_CACHE_MAX_BYTES)
+            elif kind == "memory":
+                _backend = MemorySnapshotBackend(settings.GRAPH_CACHE_MAX_BYTES)
+            else:
+                _backend = False
+        return _backend or None
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_graph_snapshot(project_id: int, version: int) -> Optional[bytes]:
+    backend = _get_backend()
+    if backend is None:
+        return None
+    body = backend.get(project_id, version)
+    _count("hits" if body is not None else "misses")
+    return body
+
+
+def put_graph_snapshot(project_id: int, version: int, body: bytes) -> None:
+    backend = _get_backend()
+    if backend is not None:
+        backend.put(project_id, version, body)
+
+
+def invalidate_graph_snapshot(project_id: int) -> None:
+    """功能 / 依赖边 / 布局写入提交后调用。"""
+    backend = _get_backend()
+    if backend is not None:
+        backend.invalidate(project_id)
+        _count("invalidations")
+
+
+def graph_cache_stats() -> Dict:
+    backend = _get_backend()
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / total, 4) if total else None
+    stats["backend"] = settings.GRAPH_CACHE_BACKEND.lower() if backend is not None else "off"
+    stats["max_bytes"] = settings.GRAPH_CACHE_MAX_BYTES
+    stats.update(backend.usage() if backend is not None else {"entries": 0, "bytes": 0, "evictions": 0})
+    return stats
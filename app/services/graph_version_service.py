@@ -0,0 +1,113 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.graph_change import GraphChange
+from app.db.models.project import Project
+from app.utils.id_gen import generate_ids
+
+
+# (entity, entity_id, op)：entity 为 feature / edge，op 为 create / update / delete
+GraphChangeItem = Tuple[str, int, str]
+
+_LOG_CHUNK = 500
+
+
+def _max_logged_version(db: Session, project_id: int) -> int:
+    return db.execute(
+        select(func.coalesce(func.max(GraphChange.version), 0)).where(GraphChange.project_id == project_id)
+    ).scalar() or 0
+
+
+def current_graph_version(db: Session, project_id: int) -> int:
+    v = db.execute(select(Project.graph_version).where(Project.id == project_id)).scalar()
+    if v is None:
+        # 项目行不存在（直接按 project_id 写入的数据）：以变更日志为准
+        return _max_logged_version(db, project_id)
+    return v
+
+
+def record_graph_changes(db: Session, project_id: int, changes: Iterable[GraphChangeItem]) -> Optional[int]:
+    """在调用方的事务内递增项目图版本并写入变更日志（不提交）；无变更时返回 None。
+    版本号由 UPDATE projects SET graph_version = graph_version + 1 分配，并发写入按行锁串行，版本不重复。
+    """
+    changes = list(changes)
+    if not changes:
+        return None
+    res = db.execute(
+        update(Project.__table__)
+        .where(Project.__table__.c.id == project_id)
+        .values(graph_version=Project.__table__.c.graph_version + 1)
+    )
+    if res.rowcount:
+        version = db.execute(select(Project.graph_version).where(Project.id == project_id)).scalar()
+    else:
+        version = _max_logged_version(db, project_id) + 1
+    recs = [
+        {
+            "id": new_id,
+            "str_id": None,
+            "is_deleted": 0,
+            "create_user_id": 0,
+            "project_id": project_id,
+            "version": version,
+            "entity": entity,
+            "entity_id": entity_id,
+            "op": op,
+        }
+        for (entity, entity_id, op), new_id in zip(changes, generate_ids(len(changes)))
+    ]
+    for i in range(0, len(recs), _LOG_CHUNK):
+        db.execute(insert(GraphChange.__table__), recs[i:i + _LOG_CHUNK])
+    # 保留最近 GRAPH_CHANGE_RETAIN_VERSIONS 个版本的日志，更早的由 changes_available 判定为需全量同步
+    keep = max(1, settings.GRAPH_CHANGE_RETAIN_VERSIONS)
+    if version > keep:
+        db.execute(
+            delete(GraphChange.__table__).where(
+                GraphChange.__table__.c.project_id == project_id,
+                GraphChange.__table__.c.version <= version - keep,
+            )
+        )
+    return version
+
+
+def changes_available(db: Session, project_id: int, since: int, version: int) -> bool:
+    """since 之后的变更是否都还在日志中：每个版本至少有一行日志，最早保留的版本不晚于 since + 1 即完整。"""
+    if since >= version:
+        return True
+    oldest = db.execute(
+        select(func.min(GraphChange.version)).where(GraphChange.project_id == project_id)
+    ).scalar()
+    return oldest is not None and oldest <= since + 1
+
+
+def changes_since(db: Session, project_id: int, since: int) -> Dict[str, Dict[str, List[int]]]:
+    """汇总 version > since 的变更：每个实体按时间顺序合并为 added / changed / removed 之一。
+    窗口内新建后又删除的实体不出现。
+    """
+    rows = db.execute(
+        select(GraphChange.entity, GraphChange.entity_id, GraphChange.op)
+        .where(GraphChange.project_id == project_id, GraphChange.version > since)
+        .order_by(GraphChange.version, GraphChange.id)
+    )
+    state: Dict[Tuple[str, int], str] = {}
+    for r in rows:
+        key = (r.entity, r.entity_id)
+        prev = state.get(key)
+        if r.op == "delete":
+            if prev == "added":
+                del state[key]
+            else:
+                state[key] = "removed"
+        elif r.op == "create" or prev == "added":
+            state[key] = "added"
+        else:
+            state[key] = "changed"
+    out: Dict[str, Dict[str, List[int]]] = {
+        e: {"added": [], "changed": [], "removed": []} for e in ("feature", "edge")
+    }
+    for (entity, entity_id), kind in state.items():
+        out.setdefault(entity, {"added": [], "changed": [], "removed": []})[kind].append(entity_id)
+    return out
@@ -0,0 +1,133 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models.file_fingerprint import FileFingerprint
+from app.services.file_bulk_service import bulk_upsert
+from app.utils.id_gen import generate_ids
+
+
+# (st_dev, st_ino, st_size, st_mtime_ns)
+Fingerprint = Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]
+
+_UPDATE_COLS = ("st_dev", "st_ino", "size_bytes", "mtime_ns", "hash_sha256", "git_blob")
+
+
+class HashCache:
+    """内容哈希缓存（file_fingerprints 表）：
+    仅当 (st_dev, st_ino, st_size, st_mtime_ns) 指纹变化时才重新计算 SHA-256；
+    git 索引模式下 blob id 相同也视为命中（例如重新 clone 后指纹全变但内容未变）。
+    与扫描批次配合使用：先 load(paths) 载入本批指纹，再 get/put，最后 flush 批量写回。
+    """
+
+    def __init__(self, db: Session, project_id: int) -> None:
+        self.db = db
+        self.project_id = project_id
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[str, object] = {}
+        self._pending: List[dict] = []
+        self._new: List[dict] = []
+
+    def load(self, paths: Iterable[str]) -> None:
+        paths = list(set(paths))
+        self._rows = {}
+        if not paths:
+            return
+        stmt = select(
+            FileFingerprint.id,
+            FileFingerprint.path,
+            FileFingerprint.st_dev,
+            FileFingerprint.st_ino,
+            FileFingerprint.size_bytes,
+            FileFingerprint.mtime_ns,
+            FileFingerprint.hash_sha256,
+            FileFingerprint.git_blob,
+        ).where(
+            FileFingerprint.project_id == self.project_id,
+            FileFingerprint.is_deleted == 0,
+            FileFingerprint.path.in_(paths),
+        )
+        self._rows = {r.path: r for r in self.db.execute(stmt)}
+
+    def get(self, path: str, fp: Fingerprint, blob: Optional[str] = None) -> Optional[str]:
+        """指纹（或 git blob id）一致返回缓存哈希并计为命中，否则计为未命中。"""
+        row = self._rows.get(path)
+        if row is not None and row.hash_sha256:
+            if (row.st_dev, row.st_ino, row.size_bytes, row.mtime_ns) == fp:
+                self.hits += 1
+                return row.hash_sha256
+            if blob and row.git_blob == blob:
+                # 内容未变，仅刷新指纹
+                self.hits += 1
+                self.put(path, fp, row.hash_sha256, blob)
+                return row.hash_sha256
+        self.misses += 1
+        return None
+
+    def put(self, path: str, fp: Fingerprint, hash_sha256: Optional[str], blob: Optional[str] = None) -> None:
+        if not hash_sha256:
+            return
+        row = self._rows.get(path)
+        rec = {
+            "id": row.id if row is not None else None,
+            "str_id": None,
+            "is_deleted": 0,
+            "create_user_id": 0,
+            "project_id": self.project_id,
+            "path": path,
+            "st_dev": fp[0],
+            "st_ino": fp[1],
+            "size_bytes": fp[2],
+            "mtime_ns": fp[3],
+            "hash_sha256": hash_sha256,
+            "git_blob": blob,
+        }
+        self._pending.append(rec)
+        if row is None:
+            self._new.append(rec)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        for rec, new_id in zip(self._new, generate_ids(len(self._new))):
+            rec["id"] = new_id
+        new_ids = {rec["id"] for rec in self._new}
+        rows, self._pending, self._new = self._pending, [], []
+        bulk_upsert(self.db, FileFingerprint.__table__, rows, _UPDATE_COLS, new_ids)
+
+
+def load_dir_fingerprint(db: Session, project_id: int, path: str):
+    """目录指纹（hash 为空，仅 dev/ino/size/mtime_ns）；path 为 "." 表示工作区根。"""
+    stmt = select(
+        FileFingerprint.id,
+        FileFingerprint.st_dev,
+        FileFingerprint.st_ino,
+        FileFingerprint.size_bytes,
+        FileFingerprint.mtime_ns,
+    ).where(
+        FileFingerprint.project_id == project_id,
+        FileFingerprint.is_deleted == 0,
+        FileFingerprint.path == path,
+    )
+    return db.execute(stmt).first()
+
+
+def save_dir_fingerprint(db: Session, project_id: int, path: str, fp: Fingerprint, row=None) -> None:
+    new_id = generate_ids(1)[0] if row is None else None
+    rec = {
+        "id": row.id if row is not None else new_id,
+        "str_id": None,
+        "is_deleted": 0,
+        "create_user_id": 0,
+        "project_id": project_id,
+        "path": path,
+        "st_dev": fp[0],
+        "st_ino": fp[1],
+        "size_bytes": fp[2],
+        "mtime_ns": fp[3],
+        "hash_sha256": None,
+        "git_blob": None,
+    }
+    bulk_upsert(db, FileFingerprint.__table__, [rec], _UPDATE_COLS, {new_id} if new_id else set())
@@ -0,0 +1,190 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+def _translate(pat: str) -> str:
+    """gitignore glob → 正则片段（不含锚点）。"""
+    out = []
+    i, n = 0, len(pat)
+    while i < n:
+        c = pat[i]
+        if c == "*":
+            if pat[i:i + 2] == "**":
+                if i + 2 == n:
+                    out.append(".*")
+                    i += 2
+                    continue
+                if pat[i + 2] == "/":
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                out.append("[^/]*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and pat[j] in "!^":
+                j += 1
+            if j < n and pat[j] == "]":
+                j += 1
+            while j < n and pat[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+            else:
+                body = pat[i + 1:j].replace("\\", "\\\\")
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pat[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def _parse_line(line: str) -> Optional[Tuple[str, bool, bool]]:
+    """单行 → (regex, negate, dir_only)；空行与注释返回 None。"""
+    line = line.rstrip("\n").rstrip("\r")
+    # 去掉未转义的行尾空格
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    negate = False
+    if line.startswith("!"):
+        negate = True
+        line = line[1:]
+    elif line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # 含非结尾的 "/" 即相对于 .gitignore 所在目录锚定
+    anchored = "/" in line
+    line = line.lstrip("/")
+    body = _translate(line)
+    regex = f"^{body}$" if anchored else f"^(?:.*/)?{body}$"
+    return regex, negate, dir_only
+
+
+class _Rules:
+    """单个 ignore 文件编译后的匹配器。无取反规则时合并为一条正则；否则按“最后匹配者生效”逆序判断。"""
+
+    def __init__(self, rules: List[Tuple[str, bool, bool]]) -> None:
+        self.ordered: Optional[List[Tuple[re.Pattern, bool, bool]]] = None
+        self.file_re: Optional[re.Pattern] = None
+        self.dir_re: Optional[re.Pattern] = None
+        if any(neg for _, neg, _ in rules):
+            self.ordered = [(re.compile(rx), neg, d) for rx, neg, d in reversed(rules)]
+        else:
+            file_rx = [rx for rx, _, d in rules if not d]
+            if file_rx:
+                self.file_re = re.compile("|".join(f"(?:{rx})" for rx in file_rx))
+            self.dir_re = re.compile("|".join(f"(?:{rx})" for rx, _, _ in rules))
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """True=忽略，False=被 "!" 重新包含，None=无规则命中。"""
+        if self.ordered is None:
+            rx = self.dir_re if is_dir else self.file_re
+            return True if rx is not None and rx.match(path) else None
+        for rx, neg, dir_only in self.ordered:
+            if dir_only and not is_dir:
+                continue
+            if rx.match(path):
+                return not neg
+        return None
+
+
+# 跨扫描缓存：ignore 文件绝对路径 -> ((mtime_ns, size), 编译结果)
+_rules_cache: Dict[str, Tuple[Tuple[int, int], Optional[_Rules]]] = {}
+_rules_lock = threading.Lock()
+
+
+def _load_rules(path: str) -> Optional[_Rules]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    with _rules_lock:
+        hit = _rules_cache.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            rules = [r for r in (_parse_line(ln) for ln in f) if r is not None]
+    except OSError:
+        rules = []
+    compiled = _Rules(rules) if rules else None
+    with _rules_lock:
+        _rules_cache[path] = (key, compiled)
+    return compiled
+
+
+class IgnoreMatcher:
+    """按目录层级叠加的 ignore 规则链（外层在前）；更深层的 .gitignore 优先级更高。
+    每层为 (相对工作区根的目录前缀, 规则)，不可变，子目录通过 child() 派生。
+    """
+
+    def __init__(self, levels: Tuple[Tuple[str, _Rules], ...] = ()) -> None:
+        self.levels = levels
+
+    @classmethod
+    def for_root(cls, root: Path) -> "IgnoreMatcher":
+        if not settings.SCAN_GITIGNORE:
+            return cls()
+        levels = []
+        # 优先级由低到高：.git/info/exclude < 项目级 ignore 文件 < 根目录 .gitignore
+        for p in (root / ".git" / "info" / "exclude", root / settings.SCAN_IGNORE_FILE, root / ".gitignore"):
+            rules = _load_rules(str(p))
+            if rules is not None:
+                levels.append(("", rules))
+        return cls(tuple(levels))
+
+    def child(self, dir_abs: str, rel_dir: str, has_gitignore: bool) -> "IgnoreMatcher":
+        """进入子目录 rel_dir；has_gitignore 由调用方根据已有的目录列表判断，避免额外 stat。"""
+        if not has_gitignore or not settings.SCAN_GITIGNORE or rel_dir in (".", ""):
+            return self
+        rules = _load_rules(os.path.join(dir_abs, ".gitignore"))
+        if rules is None:
+            return self
+        return IgnoreMatcher(self.levels + ((rel_dir + "/", rules),))
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        for base, rules in reversed(self.levels):
+            if base:
+                if not rel_path.startswith(base):
+                    continue
+                sub = rel_path[len(base):]
+            else:
+                sub = rel_path
+            r = rules.match(sub, is_dir)
+            if r is not None:
+                return r
+        return False
+
+
+def matcher_for_dir(root: Path, rel_dir: Optional[str]) -> IgnoreMatcher:
+    """构造某目录（相对工作区根，None 为根）的规则链：逐级加载祖先目录的 .gitignore。"""
+    m = IgnoreMatcher.for_root(root)
+    if not rel_dir or not settings.SCAN_GITIGNORE:
+        return m
+    parts = rel_dir.split("/")
+    for i in range(1, len(parts) + 1):
+        sub = "/".join(parts[:i])
+        abs_dir = os.path.join(str(root), sub)
+        m = m.child(abs_dir, sub, os.path.isfile(os.path.join(abs_dir, ".gitignore")))
+    return m
@@ -0,0 +1,111 @@
+import json
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models.file_import import FileImport
+from app.services.file_bulk_service import bulk_upsert
+from app.services.hash_cache_service import Fingerprint
+from app.utils.id_gen import generate_ids
+
+
+_UPDATE_COLS = ("st_dev", "st_ino", "size_bytes", "mtime_ns", "hash_sha256", "extractor_version", "imports_json")
+
+
+class ImportCache:
+    """按文件缓存提取出的 import（file_imports 表），用法与 HashCache 相同：load → get/put → flush。
+    命中条件：指纹 (dev, ino, size, mtime_ns) 一致；指纹变化但内容 SHA-256 一致也算命中（只刷新指纹）。
+    extractor_version 不同的缓存行一律视为未命中。
+    """
+
+    def __init__(self, db: Session, project_id: int, version: int) -> None:
+        self.db = db
+        self.project_id = project_id
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[str, object] = {}
+        self._pending: List[dict] = []
+        self._new: List[dict] = []
+
+    def load(self, paths: Iterable[str]) -> None:
+        paths = list(set(paths))
+        self._rows = {}
+        if not paths:
+            return
+        stmt = select(
+            FileImport.id,
+            FileImport.path,
+            FileImport.st_dev,
+            FileImport.st_ino,
+            FileImport.size_bytes,
+            FileImport.mtime_ns,
+            FileImport.hash_sha256,
+            FileImport.extractor_version,
+            FileImport.imports_json,
+        ).where(
+            FileImport.project_id == self.project_id,
+            FileImport.is_deleted == 0,
+            FileImport.path.in_(paths),
+        )
+        self._rows = {r.path: r for r in self.db.execute(stmt)}
+
+    def _valid(self, path: str):
+        row = self._rows.get(path)
+        if row is None or row.extractor_version != self.version or row.imports_json is None:
+            return None
+        return row
+
+    def get(self, path: str, fp: Fingerprint) -> Optional[list]:
+        """指纹一致时返回缓存的 import 列表（计为命中）；否则返回 None，由调用方读文件后再 get_by_hash。"""
+        row = self._valid(path)
+        if row is not None and (row.st_dev, row.st_ino, row.size_bytes, row.mtime_ns) == fp:
+            self.hits += 1
+            return json.loads(row.imports_json)
+        return None
+
+    def cached_hash(self, path: str) -> Optional[str]:
+        """有效缓存行的内容哈希（供 worker 判断内容未变时跳过解析）。"""
+        row = self._valid(path)
+        return row.hash_sha256 if row is not None else None
+
+    def get_by_hash(self, path: str, fp: Fingerprint, hash_sha256: str) -> Optional[list]:
+        row = self._valid(path)
+        if row is not None and row.hash_sha256 == hash_sha256:
+            self.hits += 1
+            imports = json.loads(row.imports_json)
+            self.put(path, fp, hash_sha256, imports)
+            return imports
+        self.misses += 1
+        return None
+
+    def put(self, path: str, fp: Fingerprint, hash_sha256: str, imports: list) -> None:
+        row = self._rows.get(path)
+        rec = {
+            "id": row.id if row is not None else None,
+            "str_id": None,
+            "is_deleted": 0,
+            "create_user_id": 0,
+            "project_id": self.project_id,
+            "path": path,
+            "st_dev": fp[0],
+            "st_ino": fp[1],
+            "size_bytes": fp[2],
+            "mtime_ns": fp[3],
+            "hash_sha256": hash_sha256,
+            "extractor_version": self.version,
+            "imports_json": json.dumps(imports, ensure_ascii=False, separators=(",", ":")),
+        }
+        self._pending.append(rec)
+        if row is None:
+            self._new.append(rec)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        for rec, new_id in zip(self._new, generate_ids(len(self._new))):
+            rec["id"] = new_id
+        new_ids = {rec["id"] for rec in self._new}
+        rows, self._pending, self._new = self._pending, [], []
+        bulk_upsert(self.db, FileImport.__table__, rows, _UPDATE_COLS, new_ids)
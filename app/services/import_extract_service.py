@@ -0,0 +1,249 @@
+"""import 提取（纯函数，仅依赖标准库）：既在请求线程中串行调用，也作为进程池 worker 的入口。"""
+import ast
+import hashlib
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+
+# import 提取规则变化时递增，使 file_imports 中的旧缓存失效
+IMPORT_EXTRACTOR_VERSION = 3
+
+# (module, 解析语言, confidence, from-import 的名字)；Python 相对导入的 module 带前导点（"..pkg.mod"）
+ImportTuple = Tuple[str, str, float, Tuple[str, ...]]
+
+
+def extractor_version(js_header_only: bool) -> int:
+    """写入 file_imports.extractor_version 的值：只扫描头部时结果不同，需单独缓存。"""
+    return IMPORT_EXTRACTOR_VERSION * 2 + (1 if js_header_only else 0)
+
+
+# ---- JS/TS import 词法扫描 ----
+# 单次线性扫描：_JS_RUN 一次性跳过普通代码、完整的字符串与注释，只在 import/export/require、反引号、
+# 斜杠（正则或除号）以及需要计数时的花括号处停下交给 Python 处理；各分支不会回到已扫描过的文本，
+# 压缩后的超长单行也保持线性。
+_JS_STRINGS = (
+    r"'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    r"|//[^\n]*"
+    r"|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+    r"|(?!(?:import|export|require)(?![\w$]))[\w$]+"
+)
+_JS_RUN = re.compile(r"(?:[^'\"`/\w$]+|" + _JS_STRINGS + r")*")
+# 位于模板 ${ } 内或头部模式时需要计数花括号；头部模式还要在换行处检查下一行
+_JS_RUN_BRACES = re.compile(r"(?:[^'\"`/{}\w$]+|" + _JS_STRINGS + r")*")
+_JS_RUN_HEADER = re.compile(r"(?:[^'\"`/{}\w$\n]+|" + _JS_STRINGS + r")*")
+_JS_KEYWORD = re.compile(r"import|export|require")
+_JS_WORD_END = re.compile(r"[\w$]*")
+# 头部区的行：空行、import、export {…}/export * … from、变量声明（常见的 const x = require(...)）、指令、注释与续行
+_JS_HEADER_LINE = re.compile(
+    r"(\s*)(?:\Z|import(?![\w$])|export\s*(?:[{*]|type\s*\{)|(?:const|let|var|require)(?![\w$])"
+    r"|['\"]use |//|/\*|[})\];,.]|#!)"
+)
+# 模板字面量中的纯文本段，止于 ` 或 ${
+_JS_TEMPLATE = re.compile(r"[^`\\$]*(?:(?:\\.|\$(?!\{))[^`\\$]*)*", re.DOTALL)
+_JS_REGEX = re.compile(r"/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*")
+_JS_SKIP = r"(?:\s|//[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)*"
+_JS_STR = r"(?:'([^'\\\n]*)'|\"([^\"\\\n]*)\"|`([^`\\$]*)`)"
+# import/export 子句：只含标识符、花括号、逗号、* 与注释，止于 from '...'
+_JS_FROM = re.compile(r"(?:[\w$\s{},*]|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/|//[^\n]*)*?(?<![\w$])from" + _JS_SKIP + _JS_STR)
+_JS_CALL = re.compile(_JS_SKIP + r"\(" + _JS_SKIP + _JS_STR)
+_JS_BARE = re.compile(_JS_SKIP + _JS_STR)
+_JS_DOT = re.compile(_JS_SKIP + r"\.")
+# 这些关键字之后的 / 是正则字面量而不是除号
+_JS_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield", "await"}
+_JS_REGEX_PREV = set("(,=:[!&|?{};+-*%<>~^")
+# 动态 import 与 require 可能位于条件分支中，置信度略低
+_JS_KIND_CONFIDENCE = {"import": 0.85, "export": 0.85, "side-effect": 0.85, "require": 0.8, "dynamic": 0.7}
+
+
+def _prev_char(text: str, pos: int) -> int:
+    i = pos - 1
+    while i >= 0 and text[i] in " \t\r\n":
+        i -= 1
+    return i
+
+
+def _regex_allowed(text: str, pos: int) -> bool:
+    i = _prev_char(text, pos)
+    if i < 0 or text[i] in _JS_REGEX_PREV:
+        return True
+    if text[i].isalnum() or text[i] in "_$":
+        j = i
+        while j >= 0 and (text[j].isalnum() or text[j] in "_$"):
+            j -= 1
+        return text[j + 1:i + 1] in _JS_REGEX_KEYWORDS
+    return False
+
+
+def _str_value(m: "re.Match") -> Optional[str]:
+    for g in m.groups()[-3:]:
+        if g is not None:
+            return g
+    return None
+
+
+def scan_js_imports(text: str, header_only: bool = False) -> List[Tuple[str, str]]:
+    """提取 JS/TS 源码中的模块说明符，返回 [(specifier, kind)]，kind 为 import/export/side-effect/dynamic/require。
+    跳过字符串、注释、模板字面量（含 ${} 嵌套）与正则字面量；支持多行 import、export ... from、
+    import "x"、import("x") 与 require("x")。header_only=True 时在第一条不属于 import 区的顶层语句处停止。
+    """
+    out: List[Tuple[str, str]] = []
+    if header_only and not _JS_HEADER_LINE.match(text):
+        return out
+    n = len(text)
+    end = n
+    if not header_only:
+        # 预筛：不含任何关键字的文件直接返回；最后一个关键字所在的词之后不可能再有结果，只扫描到那里
+        last = max(text.rfind("import"), text.rfind("export"), text.rfind("require"))
+        if last < 0:
+            return out
+        end = _JS_WORD_END.match(text, last).end()
+    depth = 0
+    # 位于模板 ${ } 内时记录进入时的花括号深度，回到该深度的 } 即回到模板文本
+    templates: List[int] = []
+    pos = 0
+    while pos < end:
+        run = _JS_RUN_HEADER if header_only else (_JS_RUN_BRACES if templates else _JS_RUN)
+        pos = run.match(text, pos, end).end()
+        if pos >= end:
+            break
+        c = text[pos]
+        if c == "\n":
+            pos += 1
+            if depth == 0 and not templates:
+                line = _JS_HEADER_LINE.match(text, pos)
+                if line is None:
+                    break
+                # 连续空行一并跳过，停在该行第一个记号处
+                pos = line.end(1)
+        elif c == "'" or c == '"':
+            # 未闭合的字符串：跳到行尾
+            e = text.find("\n", pos)
+            pos = n if e < 0 else e
+        elif c == "`" or (c == "}" and templates and templates[-1] == depth):
+            if c == "}":
+                templates.pop()
+            pos = _JS_TEMPLATE.match(text, pos + 1).end()
+            if text.startswith("${", pos):
+                templates.append(depth)
+                pos += 2
+            else:
+                pos += 1
+        elif c == "{":
+            depth += 1
+            pos += 1
+        elif c == "}":
+            depth = max(0, depth - 1)
+            pos += 1
+        elif c == "/":
+            if text.startswith("/*", pos):
+                break  # 未闭合的块注释
+            r = _JS_REGEX.match(text, pos) if _regex_allowed(text, pos) else None
+            pos = r.end() if r is not None else pos + 1
+        else:
+            word = _JS_KEYWORD.match(text, pos).group()
+            i = _prev_char(text, pos)
+            pos += len(word)
+            if i >= 0 and text[i] == ".":
+                continue  # 属性访问，如 obj.require(...)
+            if word == "export":
+                r = _JS_FROM.match(text, pos)
+                kind = "export"
+            else:
+                r = _JS_CALL.match(text, pos)
+                kind = "require" if word == "require" else "dynamic"
+                if r is None and word == "import" and _JS_DOT.match(text, pos) is None:  # 排除 import.meta
+                    r = _JS_BARE.match(text, pos)
+                    kind = "side-effect"
+                    if r is None:
+                        r = _JS_FROM.match(text, pos)
+                        kind = "import"
+            if r is not None:
+                spec = _str_value(r)
+                if spec is not None:
+                    out.append((spec, kind))
+                pos = r.end()
+    return out
+
+
+def extract_imports(text: str, lang: str, js_header_only: bool = False) -> List[ImportTuple]:
+    """提取源文件中的 import（未解析为路径，可缓存）。"""
+    out: List[ImportTuple] = []
+    if lang == "python":
+        try:
+            tree = ast.parse(text)
+        except Exception:
+            tree = None
+        if tree:
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    for n in node.names:
+                        out.append((n.name, "python", 0.9, ()))
+                elif isinstance(node, ast.ImportFrom):
+                    # 保留相对级数：from ..a import b → ("..a", ..., ("b",))，由 ModuleIndex 换算目录
+                    mod = "." * (node.level or 0) + (node.module or "")
+                    names = tuple(n.name for n in node.names if n.name != "*")
+                    out.append((mod, "python", 0.85, names))
+    elif lang in ("ts", "js"):
+        for spec, kind in scan_js_imports(text, js_header_only):
+            out.append((spec, "ts", _JS_KIND_CONFIDENCE[kind], ()))
+    return out
+
+
+def read_and_extract(
+    full_path: str,
+    lang: str,
+    known_hash: Optional[str],
+    js_header_only: bool = False,
+) -> Optional[Tuple[str, Optional[List[ImportTuple]]]]:
+    """读取文件并返回 (sha256, imports)；内容哈希等于 known_hash 时不解析，imports 为 None（复用缓存）。
+    读取失败返回 None。返回值只含字符串与数字元组，跨进程传输开销小。
+    """
+    try:
+        with open(full_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    hashv = hashlib.sha256(data).hexdigest()
+    if hashv == known_hash:
+        return hashv, None
+    return hashv, extract_imports(data.decode("utf-8", errors="ignore"), lang, js_header_only)
+
+
+def _read_and_extract_chunk(tasks: List[Tuple[str, str, Optional[str], bool]]) -> list:
+    return [read_and_extract(*t) for t in tasks]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn：服务进程内有多个线程，fork 子进程可能继承被持有的锁
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def extract_many(tasks: List[Tuple[str, str, Optional[str], bool]], workers: int, chunk_size: int) -> list:
+    """并行版 read_and_extract：按 chunk_size 个文件一组分发到常驻进程池，结果与输入顺序一致。"""
+    if not tasks:
+        return []
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    out: list = []
+    for part in _get_pool(workers).map(_read_and_extract_chunk, chunks):
+        out.extend(part)
+    return out
+
+
+def shutdown_extract_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -1,8 +1,12 @@
-from typing import Dict, List, Tuple
+import math
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, select, update
 from sqlalchemy.orm import Session
 
 from app.db.models.feature import Feature
 from app.db.models.edge import Edge as EdgeModel
+from app.services.graph_version_service import record_graph_changes
 
 
 def _axial_from_grid(col: int, row: int) -> Tuple[int, int]:
@@ -84,15 +88,369 @@ def plan_layout_simple(db: Session, project_id: int) -> Dict[int, Tuple[int, int
     return pos
 
 
+def _break_cycles(n: int, succ: List[List[int]]) -> List[List[int]]:
+    """去环：按 (强连通分量的拓扑序, 入度 - 出度) 给节点排序，逆着该顺序的边反向。
+    分量之间的边本来就顺着拓扑序，只有环内的边可能被反向；入度小、出度大的节点排在前面，
+    反向的边数接近贪心最小反馈边集。返回无环的后继表（去重、去自环）。
+    """
+    # 迭代 Tarjan：分量按逆拓扑序产出
+    index = [-1] * n
+    low = [0] * n
+    on_stack = bytearray(n)
+    comp = [0] * n
+    stack: List[int] = []
+    counter = 0
+    n_comp = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while work:
+            u, k = work[-1]
+            if k < len(succ[u]):
+                work[-1] = (u, k + 1)
+                v = succ[u][k]
+                if index[v] == -1:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = 1
+                    work.append((v, 0))
+                elif on_stack[v] and index[v] < low[u]:
+                    low[u] = index[v]
+                continue
+            work.pop()
+            if work:
+                p = work[-1][0]
+                if low[u] < low[p]:
+                    low[p] = low[u]
+            if low[u] == index[u]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    comp[w] = n_comp
+                    if w == u:
+                        break
+                n_comp += 1
+    balance = [0] * n
+    for u in range(n):
+        for v in succ[u]:
+            balance[u] -= 1
+            balance[v] += 1
+    order = sorted(range(n), key=lambda u: (-comp[u], balance[u], u))
+    rank = [0] * n
+    for i, u in enumerate(order):
+        rank[u] = i
+    dag: List[List[int]] = [[] for _ in range(n)]
+    for u in range(n):
+        for v in succ[u]:
+            if rank[u] < rank[v]:
+                dag[u].append(v)
+            elif rank[v] < rank[u]:
+                dag[v].append(u)
+    return [list(dict.fromkeys(vs)) for vs in dag]
+
+
+def layered_layout(
+    node_ids: List[int],
+    edges: List[Tuple[int, int]],
+    locked: Optional[Dict[int, Tuple[int, int]]] = None,
+    max_width: Optional[int] = None,
+    sweeps: int = 4,
+) -> Dict[int, Tuple[int, int]]:
+    """
+    分层布局（纯函数，不访问数据库）：
+    - 去环：按强连通分量拓扑序与入出度差排序，逆序的边反向；
+    - 最长路径分层：源点为第 0 层，其余节点层号 = max(前驱层号) + 1；
+    - 交叉减少：上下交替的重心（barycenter）排序，以相邻层邻居的居中位置为准；
+    - 压缩：过宽的层按 max_width 交错折成多行（保持左右顺序），每行居中映射到轴坐标；无边的孤立节点集中放在末尾；
+    - locked 中的节点保持原坐标，其占用的格子在放置时跳过。
+    返回: {node_id: (q, r)}（含 locked 节点）
+    """
+    locked = locked or {}
+    n = len(node_ids)
+    idx = {fid: i for i, fid in enumerate(node_ids)}
+    succ: List[List[int]] = [[] for _ in range(n)]
+    has_edge = bytearray(n)
+    for a, b in edges:
+        i, j = idx.get(a), idx.get(b)
+        if i is None or j is None or i == j:
+            continue
+        succ[i].append(j)
+        has_edge[i] = has_edge[j] = 1
+    dag = _break_cycles(n, succ)
+    pred: List[List[int]] = [[] for _ in range(n)]
+    for u in range(n):
+        for v in dag[u]:
+            pred[v].append(u)
+
+    # 最长路径分层（Kahn 拓扑序）
+    layer = [0] * n
+    indeg = [len(p) for p in pred]
+    queue = [u for u in range(n) if indeg[u] == 0 and has_edge[u]]
+    for u in queue:  # queue 在遍历中追加，即 BFS 拓扑序
+        lu = layer[u] + 1
+        for v in dag[u]:
+            if layer[v] < lu:
+                layer[v] = lu
+            indeg[v] -= 1
+            if indeg[v] == 0:
+                queue.append(v)
+    n_layers = max((layer[u] for u in queue), default=-1) + 1
+    layers: List[List[int]] = [[] for _ in range(n_layers)]
+    for u in queue:
+        layers[layer[u]].append(u)
+    orphans = [u for u in range(n) if not has_edge[u]]
+
+    if max_width is None:
+        max_width = max(8, int(math.sqrt(n) * 2))
+
+    def _place(nodes: List[int]) -> None:
+        # 层内第 k 个节点的横向位置：过宽的层折成 bands 行交错排布，横坐标约为 k / bands，居中
+        bands = -(-len(nodes) // max_width)
+        c = (len(nodes) - 1) / 2
+        for k, u in enumerate(nodes):
+            pos[u] = (k - c) / bands
+
+    # 重心排序：pos 为节点在最终网格上的居中横向位置
+    pos = [0.0] * n
+    for nodes in layers:
+        _place(nodes)
+    for it in range(sweeps):
+        down = it % 2 == 0
+        order = layers[1:] if down else layers[-2::-1]
+        nbrs = pred if down else dag
+        for nodes in order:
+            # 优先只看相邻层的邻居（未插入虚拟节点，跨多层的长边只在没有相邻邻居时参与）
+            near = layer[nodes[0]] + (-1 if down else 1)
+            keyed = []
+            for u in nodes:
+                ns = [v for v in nbrs[u] if layer[v] == near] or nbrs[u]
+                keyed.append((sum(pos[v] for v in ns) / len(ns) if ns else pos[u], pos[u], u))
+            keyed.sort()
+            nodes[:] = [u for _, _, u in keyed]
+            _place(nodes)
+
+    # 压缩到六边形网格：每层折成若干行（第 k 个节点放到第 k % bands 行），保持左右顺序；跳过锁定节点占用的格子
+    rows: List[List[int]] = []
+    for nodes in layers:
+        free = [u for u in nodes if node_ids[u] not in locked]
+        bands = -(-len(free) // max_width)
+        rows.extend(free[b::bands] for b in range(bands))
+    for i in range(0, len(orphans), max_width):
+        free = [u for u in orphans[i:i + max_width] if node_ids[u] not in locked]
+        if free:
+            rows.append(free)
+
+    taken = set(locked.values())
+    out: Dict[int, Tuple[int, int]] = dict(locked)
+    for row, nodes in enumerate(rows):
+        col = -(len(nodes) // 2)
+        for u in nodes:
+            cell = _axial_from_grid(col, row)
+            while cell in taken:
+                col += 1
+                cell = _axial_from_grid(col, row)
+            taken.add(cell)
+            out[node_ids[u]] = cell
+            col += 1
+    return out
+
+
+def plan_layout_layered(db: Session, project_id: int, max_width: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+    """读取项目的功能与边（只取所需列），调用 layered_layout。返回: {feature_id: (q, r)}"""
+    feats = db.execute(
+        select(Feature.id, Feature.hex_q, Feature.hex_r, Feature.layout_locked).where(
+            Feature.project_id == project_id, Feature.is_deleted == 0
+        )
+    ).all()
+    edges = db.execute(
+        select(EdgeModel.from_feature_id, EdgeModel.to_feature_id).where(
+            EdgeModel.project_id == project_id, EdgeModel.is_deleted == 0
+        )
+    ).all()
+    locked = {
+        f.id: (f.hex_q, f.hex_r)
+        for f in feats
+        if f.layout_locked and f.hex_q is not None and f.hex_r is not None
+    }
+    return layered_layout([f.id for f in feats], [(e.from_feature_id, e.to_feature_id) for e in edges], locked, max_width)
+
+
+# 轴坐标的 6 个邻接方向
+_HEX_DIRS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+
+def _axial_round(qf: float, rf: float) -> Tuple[int, int]:
+    """分数轴坐标取整到最近的六边形（cube 坐标取整）。"""
+    sf = -qf - rf
+    q, r, s = round(qf), round(rf), round(sf)
+    dq, dr, ds = abs(q - qf), abs(r - rf), abs(s - sf)
+    if dq > dr and dq > ds:
+        q = -r - s
+    elif dr > ds:
+        r = -q - s
+    return int(q), int(r)
+
+
+def _hex_ring(center: Tuple[int, int], radius: int):
+    if radius == 0:
+        yield center
+        return
+    q = center[0] + _HEX_DIRS[4][0] * radius
+    r = center[1] + _HEX_DIRS[4][1] * radius
+    for dq, dr in _HEX_DIRS:
+        for _ in range(radius):
+            yield q, r
+            q, r = q + dq, r + dr
+
+
+def _nearest_free(center: Tuple[int, int], occupied) -> Tuple[int, int]:
+    radius = 0
+    while True:
+        for cell in _hex_ring(center, radius):
+            if cell not in occupied:
+                return cell
+        radius += 1
+
+
+def incremental_layout(
+    edges: List[Tuple[int, int]],
+    placed: Dict[int, Tuple[int, int]],
+    todo: List[int],
+) -> Dict[int, Tuple[int, int]]:
+    """
+    增量布局（纯函数）：placed 中的节点保持不动，只为 todo 中的节点找位置。
+    - 按与已放置节点的连通顺序（BFS）依次放置，已放置邻居越多越先放；
+    - 目标为已放置邻居坐标的平均（取整到六边形），没有邻居时取原有已占格子的中心；
+    - 以占用格子集合为空间索引，从目标向外逐圈（hex ring）找第一个空格。
+    返回: {node_id: (q, r)}（只含 todo 中的节点）
+    """
+    todo_set = set(todo)
+    nbrs: Dict[int, List[int]] = {fid: [] for fid in todo}
+    for a, b in edges:
+        if a == b:
+            continue
+        if a in todo_set:
+            nbrs[a].append(b)
+        if b in todo_set:
+            nbrs[b].append(a)
+    occupied = {cell: fid for fid, cell in placed.items()}
+    pos = dict(placed)
+    out: Dict[int, Tuple[int, int]] = {}
+
+    center = (0, 0)
+    if occupied:
+        n = len(occupied)
+        center = _axial_round(sum(q for q, _ in occupied) / n, sum(r for _, r in occupied) / n)
+
+    # 先放与已放置节点相邻最多的，再沿 BFS 扩展；剩余（与已放置部分不连通）的逐个从中心开始
+    remaining = sorted(todo, key=lambda f: -sum(1 for v in nbrs[f] if v in pos))
+    queue: List[int] = []
+    queued = set()
+    for start in remaining:
+        if start in queued:
+            continue
+        queue.append(start)
+        queued.add(start)
+        i = len(queue) - 1
+        while i < len(queue):
+            fid = queue[i]
+            i += 1
+            anchors = [pos[v] for v in nbrs[fid] if v in pos]
+            if anchors:
+                target = _axial_round(
+                    sum(q for q, _ in anchors) / len(anchors),
+                    sum(r for _, r in anchors) / len(anchors),
+                )
+            else:
+                target = center
+            cell = _nearest_free(target, occupied)
+            occupied[cell] = fid
+            pos[fid] = out[fid] = cell
+            for v in nbrs[fid]:
+                if v in todo_set and v not in queued:
+                    queued.add(v)
+                    queue.append(v)
+    return out
+
+
+def plan_layout_incremental(
+    db: Session,
+    project_id: int,
+    dirty: Optional[List[int]] = None,
+) -> Dict[int, Tuple[int, int]]:
+    """只为没有坐标或在 dirty 中（且未锁定）的功能找位置，其余保持原坐标。
+    返回: {feature_id: (q, r)}（只含坐标实际变化的功能）
+    """
+    feats = db.execute(
+        select(Feature.id, Feature.hex_q, Feature.hex_r, Feature.layout_locked).where(
+            Feature.project_id == project_id, Feature.is_deleted == 0
+        )
+    ).all()
+    edges = db.execute(
+        select(EdgeModel.from_feature_id, EdgeModel.to_feature_id).where(
+            EdgeModel.project_id == project_id, EdgeModel.is_deleted == 0
+        )
+    ).all()
+    dirty_set = set(dirty or ())
+    placed: Dict[int, Tuple[int, int]] = {}
+    todo: List[int] = []
+    old: Dict[int, Tuple[int, int]] = {}
+    for f in feats:
+        has_hex = f.hex_q is not None and f.hex_r is not None
+        if has_hex:
+            old[f.id] = (f.hex_q, f.hex_r)
+        if has_hex and (f.layout_locked or f.id not in dirty_set):
+            placed[f.id] = (f.hex_q, f.hex_r)
+        else:
+            todo.append(f.id)
+    if not todo:
+        return {}
+    pos = incremental_layout([(e.from_feature_id, e.to_feature_id) for e in edges], placed, todo)
+    return {fid: cell for fid, cell in pos.items() if old.get(fid) != cell}
+
+
+# apply_layout 每条 SQL 处理的功能数（IN 列表与 CASE 分支数）
+_LAYOUT_WRITE_CHUNK = 500
+
+
 def apply_layout(db: Session, project_id: int, positions: Dict[int, Tuple[int, int]]) -> int:
+    """批量写回坐标：先按块读出当前坐标，跳过不存在（或不属于该项目）的 id 与坐标未变的功能；
+    变化的部分每块一条 UPDATE ... SET hex_q = CASE id ..., hex_r = CASE id ... WHERE id IN (...)。
+    有变化时在同一事务内递增图版本。返回实际修改的行数。
+    """
+    ids = list(positions)
+    changed: Dict[int, Tuple[int, int]] = {}
+    for i in range(0, len(ids), _LAYOUT_WRITE_CHUNK):
+        rows = db.execute(
+            select(Feature.id, Feature.hex_q, Feature.hex_r).where(
+                Feature.project_id == project_id,
+                Feature.is_deleted == 0,
+                Feature.id.in_(ids[i:i + _LAYOUT_WRITE_CHUNK]),
+            )
+        )
+        for r in rows:
+            cell = positions[r.id]
+            if (r.hex_q, r.hex_r) != tuple(cell):
+                changed[r.id] = cell
     updated = 0
-    for fid, (q_ax, r_ax) in positions.items():
-        db.query(Feature).filter(Feature.id == fid, Feature.project_id == project_id).update({
-            Feature.hex_q: q_ax,
-            Feature.hex_r: r_ax,
-        })
-        updated += 1
+    items = list(changed.items())
+    for i in range(0, len(items), _LAYOUT_WRITE_CHUNK):
+        chunk = dict(items[i:i + _LAYOUT_WRITE_CHUNK])
+        res = db.execute(
+            update(Feature.__table__)
+            .where(Feature.__table__.c.project_id == project_id, Feature.__table__.c.id.in_(list(chunk)))
+            .values(
+                hex_q=case({fid: q for fid, (q, _) in chunk.items()}, value=Feature.__table__.c.id),
+                hex_r=case({fid: r for fid, (_, r) in chunk.items()}, value=Feature.__table__.c.id),
+            )
+        )
+        updated += res.rowcount if res.rowcount is not None and res.rowcount >= 0 else len(chunk)
+    record_graph_changes(db, project_id, [("feature", fid, "update") for fid in changed])
     db.commit()
     return updated
-
-
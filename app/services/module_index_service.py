@@ -0,0 +1,383 @@
+import json
+import os
+import posixpath
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models.file import File
+from app.services.file_bulk_service import current_scan_generation, local_writes_cover
+
+
+# TS/JS 扩展名解析优先级（与原 resolve_module_to_path 一致），其后为 index 文件
+_TS_EXTS = (".ts", ".tsx", ".js", ".jsx", ".d.ts")
+_TS_INDEX = ("index.ts", "index.js", "index.tsx", "index.jsx")
+_TS_CONFIG_RE = re.compile(r"^(tsconfig(\..+)?|jsconfig)\.json$")
+
+# 新增文件较多时整体重建，比逐个 add 更省
+_MAX_INCREMENTAL = 4096
+
+
+def _ts_stem(path: str) -> Optional[Tuple[str, int]]:
+    """TS/JS 文件 → (去扩展名的 stem, 优先级 = 在 _TS_EXTS 中的位置)；非 TS/JS 返回 None。"""
+    # 先匹配较长的扩展名，保证 "x.d.ts" 不被当作 "x.d" + ".ts"
+    for ext in sorted(_TS_EXTS, key=len, reverse=True):
+        if path.endswith(ext):
+            return path[: -len(ext)], _TS_EXTS.index(ext)
+    return None
+
+
+def _strip_jsonc(text: str) -> str:
+    """去掉 tsconfig 中允许的注释与尾逗号（字符串内容保持不变）。"""
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            i = n if j < 0 else j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+        else:
+            out.append(c)
+            i += 1
+    return re.sub(r",(\s*[}\]])", r"\1", "".join(out))
+
+
+class _TsConfig:
+    """某目录下 tsconfig/jsconfig 的 baseUrl 与 paths（均已换算为相对工作区根的路径）。"""
+
+    def __init__(self, base_url: Optional[str], paths: Dict[str, List[str]], paths_base: str) -> None:
+        self.base_url = base_url
+        self.paths = paths
+        self.paths_base = paths_base
+
+
+def _load_compiler_options(full: Path, depth: int = 0) -> Dict:
+    try:
+        data = json.loads(_strip_jsonc(full.read_text(encoding="utf-8", errors="ignore")))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    opts = dict(data.get("compilerOptions") or {})
+    ext = data.get("extends")
+    # 只跟随相对路径的 extends（包名形式需 node_modules 解析，忽略）
+    if isinstance(ext, str) and ext.startswith(".") and depth < 5:
+        parent_file = (full.parent / ext).resolve()
+        if parent_file.suffix != ".json":
+            parent_file = parent_file.with_name(parent_file.name + ".json")
+        base = _load_compiler_options(parent_file, depth + 1)
+        # 父配置中的相对路径以父配置所在目录为基准
+        for key in ("baseUrl",):
+            if key in base and key not in opts:
+                opts[key] = os.path.relpath(parent_file.parent / base[key], full.parent)
+        if "paths" in base and "paths" not in opts:
+            opts["paths"] = base["paths"]
+            opts.setdefault("baseUrl", os.path.relpath(parent_file.parent, full.parent))
+    return opts
+
+
+class ModuleIndex:
+    """单个项目的模块解析索引，由 files 表一次构建、扫描时增量追加：
+    - py_stems：去掉 ".py" / "/__init__.py" 的路径 → 文件（相对导入按级数换算目录后一次查表）；
+    - py_dotted：点分模块名 → 文件，覆盖工作区根、`src/` 布局与各包根（最外层含 __init__.py 目录的上级）；
+    - ts_stems / ts_index：去扩展名路径 → 文件、目录 → index 文件；
+    - tsconfig：按目录缓存的 baseUrl / paths 别名。
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.py_stems: Dict[str, str] = {}
+        self.py_dotted: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self.ts_stems: Dict[str, Tuple[int, str]] = {}
+        self.ts_index: Dict[str, Tuple[int, str]] = {}
+        self.ts_files: set = set()
+        self.config_mtimes: Dict[str, Optional[int]] = {}
+        self.py_roots: List[str] = [""]
+        self.ts_config_dirs: Dict[str, Optional[_TsConfig]] = {}
+        self._config_for_dir: Dict[str, Optional[_TsConfig]] = {}
+
+    # ---- 构建 ----
+    def build(self, paths: Iterable[str]) -> None:
+        paths = list(paths)
+        init_dirs = {posixpath.dirname(p) for p in paths if p.endswith("__init__.py")}
+        roots = {""}
+        for d in init_dirs:
+            if posixpath.dirname(d) not in init_dirs:
+                roots.add(posixpath.dirname(d))
+        for p in paths:
+            parts = p.split("/")
+            if "src" in parts[:-1]:
+                roots.add("/".join(parts[: parts.index("src") + 1]))
+        # 根目录优先，其余按路径排序；同名模块取排序靠前的根
+        self.py_roots = sorted(roots, key=lambda r: (r != "", r))
+        self.add(paths)
+
+    def add(self, paths: Iterable[str]) -> None:
+        for p in paths:
+            if p.endswith(".py"):
+                self._add_py(p)
+            else:
+                hit = _ts_stem(p)
+                if hit is not None:
+                    stem, prio = hit
+                    self.ts_files.add(p)
+                    cur = self.ts_stems.get(stem)
+                    if cur is None or prio < cur[0]:
+                        self.ts_stems[stem] = (prio, p)
+                    d, name = posixpath.split(p)
+                    if name in _TS_INDEX:
+                        prio = _TS_INDEX.index(name)
+                        cur = self.ts_index.get(d)
+                        if cur is None or prio < cur[0]:
+                            self.ts_index[d] = (prio, p)
+                if _TS_CONFIG_RE.match(posixpath.basename(p)):
+                    self.ts_config_dirs[posixpath.dirname(p)] = None
+                    self.config_mtimes[p] = self._mtime(p)
+                    self._config_for_dir.clear()
+
+    def _mtime(self, p: str) -> Optional[int]:
+        try:
+            return os.stat(self.root / p).st_mtime_ns
+        except OSError:
+            return None
+
+    def check_configs(self) -> None:
+        """tsconfig/jsconfig 内容变化（mtime 不同）时丢弃已解析的别名配置。"""
+        changed = False
+        for p, old in self.config_mtimes.items():
+            cur = self._mtime(p)
+            if cur != old:
+                self.config_mtimes[p] = cur
+                changed = True
+        if changed:
+            for d in self.ts_config_dirs:
+                self.ts_config_dirs[d] = None
+            self._config_for_dir.clear()
+
+    def needs_rebuild(self, paths: Iterable[str]) -> bool:
+        """新的包（__init__.py）或新的 src/ 目录可能引入新的包根，此时需整体重建点分索引。"""
+        for p in paths:
+            if p.endswith("__init__.py"):
+                return True
+            parts = p.split("/")
+            if "src" in parts[:-1] and "/".join(parts[: parts.index("src") + 1]) not in self.py_roots:
+                return True
+        return False
+
+    def _add_py(self, p: str) -> None:
+        stem = p[:-len("/__init__.py")] if p.endswith("/__init__.py") else ("" if p == "__init__.py" else p[:-3])
+        # 与原解析顺序一致：a/b.py 优先于 a/b/__init__.py
+        if stem not in self.py_stems or not p.endswith("__init__.py"):
+            self.py_stems[stem] = p
+        is_init = 1 if p.endswith("__init__.py") else 0
+        for rank, root in enumerate(self.py_roots):
+            if root and not stem.startswith(root + "/"):
+                continue
+            rel = stem[len(root) + 1:] if root else stem
+            if not rel:
+                continue
+            dotted = rel.replace("/", ".")
+            cur = self.py_dotted.get(dotted)
+            if cur is None or (rank, is_init) < cur[0]:
+                self.py_dotted[dotted] = ((rank, is_init), p)
+
+    # ---- 解析 ----
+    def resolve(self, src: str, mod: str, lang: str, names: Iterable[str] = ()) -> List[str]:
+        """解析一条 import，返回目标文件列表（通常 0 或 1 个）。
+        Python `from X import a, b`：a/b 为子模块时指向子模块，否则指向 X 本身。
+        """
+        if lang == "python":
+            out = []
+            base_needed = not names
+            for n in names:
+                hit = self._resolve_py(src, mod + n if mod.endswith(".") else f"{mod}.{n}")
+                if hit:
+                    out.append(hit)
+                else:
+                    base_needed = True
+            if base_needed:
+                hit = self._resolve_py(src, mod)
+                if hit:
+                    out.append(hit)
+            return out
+        hit = self._resolve_ts(src, mod)
+        return [hit] if hit else []
+
+    def _resolve_py(self, src: str, mod: str) -> Optional[str]:
+        if not mod.startswith("."):
+            hit = self.py_dotted.get(mod)
+            return hit[1] if hit else None
+        level = len(mod) - len(mod.lstrip("."))
+        base = posixpath.dirname(src)
+        for _ in range(level - 1):
+            if not base:
+                return None
+            base = posixpath.dirname(base)
+        rest = mod[level:].replace(".", "/")
+        stem = posixpath.join(base, rest) if rest else base
+        return self.py_stems.get(stem)
+
+    def _resolve_ts_path(self, rel: str) -> Optional[str]:
+        hit = self.ts_stems.get(rel) or self.ts_index.get(rel)
+        if hit:
+            return hit[1]
+        if rel in self.ts_files:
+            return rel
+        # ESM 风格 './a.js' 指向 a.ts
+        stem = _ts_stem(rel)
+        if stem is not None:
+            hit = self.ts_stems.get(stem[0])
+            if hit:
+                return hit[1]
+        return None
+
+    def _resolve_ts(self, src: str, mod: str) -> Optional[str]:
+        if mod.startswith("."):
+            rel = posixpath.normpath(posixpath.join(posixpath.dirname(src), mod))
+            return self._resolve_ts_path("" if rel == "." else rel)
+        cfg = self._config_for(posixpath.dirname(src))
+        if cfg is None:
+            return None
+        for pattern, targets in cfg.paths.items():
+            if "*" in pattern:
+                prefix, _, suffix = pattern.partition("*")
+                if not (mod.startswith(prefix) and mod.endswith(suffix) and len(mod) >= len(prefix) + len(suffix)):
+                    continue
+                star = mod[len(prefix):len(mod) - len(suffix)]
+            elif mod != pattern:
+                continue
+            else:
+                star = ""
+            for t in targets:
+                cand = posixpath.normpath(posixpath.join(cfg.paths_base, t.replace("*", star)))
+                hit = self._resolve_ts_path(cand)
+                if hit:
+                    return hit
+        if cfg.base_url is not None:
+            return self._resolve_ts_path(posixpath.normpath(posixpath.join(cfg.base_url, mod)))
+        return None
+
+    def _config_for(self, d: str) -> Optional[_TsConfig]:
+        """最近的含 tsconfig/jsconfig 的祖先目录配置（按目录缓存）。"""
+        if d in self._config_for_dir:
+            return self._config_for_dir[d]
+        cur = d
+        cfg = None
+        while True:
+            if cur in self.ts_config_dirs:
+                cfg = self._load_config(cur)
+                if cfg is not None:
+                    break
+            if not cur:
+                break
+            cur = posixpath.dirname(cur)
+        self._config_for_dir[d] = cfg
+        return cfg
+
+    def _load_config(self, d: str) -> Optional[_TsConfig]:
+        cached = self.ts_config_dirs.get(d)
+        if cached is not None:
+            return cached
+        base_dir = self.root / d if d else self.root
+        try:
+            names = sorted(n for n in os.listdir(base_dir) if _TS_CONFIG_RE.match(n))
+        except OSError:
+            return None
+        # tsconfig.json 优先（常只含 references），其余按名称；取第一个定义了 baseUrl/paths 的
+        names.sort(key=lambda n: n != "tsconfig.json")
+        for name in names:
+            opts = _load_compiler_options(base_dir / name)
+            if "baseUrl" not in opts and "paths" not in opts:
+                continue
+            base_url = posixpath.normpath(posixpath.join(d, opts["baseUrl"])) if "baseUrl" in opts else None
+            if base_url == ".":
+                base_url = ""
+            paths = {k: [t for t in v if isinstance(t, str)] for k, v in (opts.get("paths") or {}).items() if isinstance(v, list)}
+            # TS 4.1+：未设 baseUrl 时 paths 相对配置文件所在目录
+            paths_base = base_url if base_url is not None else d
+            cfg = _TsConfig(base_url, paths, paths_base)
+            self.ts_config_dirs[d] = cfg
+            return cfg
+        return None
+
+
+class _Entry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.index: Optional[ModuleIndex] = None
+        self.pending: List[str] = []
+        self.stale = False
+        # 构建 / 最近一次追加时的 projects.scan_generation，与本进程扫描分配的版本
+        self.built_generation = 0
+        self.local: Set[int] = set()
+
+
+_indexes: Dict[Tuple[int, str], _Entry] = {}
+_indexes_lock = threading.Lock()
+
+
+def notify_files_added(project_id: int, paths: Optional[List[str]], generation: Optional[int]) -> None:
+    """扫描提交后调用：paths 为新增文件；None 表示新增过多，下次使用时整体重建。
+    generation 为本次分配的 scan_generation（项目行不存在时为 None）。"""
+    if paths is not None and not paths:
+        return
+    with _indexes_lock:
+        entries = [e for (pid, _), e in _indexes.items() if pid == project_id]
+    for e in entries:
+        with e.lock:
+            if generation is not None:
+                e.local.add(generation)
+            if paths is None or len(e.pending) + len(paths) > _MAX_INCREMENTAL:
+                e.stale = True
+                e.pending = []
+            elif not e.stale:
+                e.pending.extend(paths)
+
+
+def _load_index(db: Session, project_id: int, root: Path) -> ModuleIndex:
+    idx = ModuleIndex(root)
+    idx.build(
+        db.execute(
+            select(File.path).where(File.project_id == project_id, File.is_deleted == 0, File.is_dir == 0)
+        ).scalars()
+    )
+    return idx
+
+
+def get_module_index(db: Session, project_id: int, root: Path) -> ModuleIndex:
+    """取项目的解析索引：首次从 files 表构建，之后只追加扫描新增的文件；
+    projects.scan_generation 显示有其他进程的写入时整体重建。"""
+    generation = current_scan_generation(db, project_id)
+    key = (project_id, str(root))
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is None:
+            entry = _indexes[key] = _Entry()
+    with entry.lock:
+        pending, entry.pending = entry.pending, []
+        if (
+            entry.index is None
+            or entry.stale
+            or not local_writes_cover(entry.built_generation, generation, entry.local)
+            or entry.index.needs_rebuild(pending)
+        ):
+            entry.index, entry.stale = _load_index(db, project_id, root), False
+        else:
+            entry.index.add(pending)
+            entry.index.check_configs()
+        entry.built_generation = generation
+        entry.local = {v for v in entry.local if v > generation}
+        return entry.index
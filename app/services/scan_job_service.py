@@ -0,0 +1,104 @@
+import json
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.db.session import SessionLocal
+from app.services.file_scan_service import scan_workspace
+
+
+# 保留最近完成的任务数量（供轮询结果）
+_KEEP_FINISHED = 50
+
+
+class ScanJob:
+    """一次后台全量扫描；progress 由 scan_workspace 按批次原地累加。"""
+
+    def __init__(self, project_id: int, parallel: Optional[bool], git: Optional[bool] = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.project_id = project_id
+        self.parallel = parallel
+        self.git = git
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.scanned: Optional[int] = None
+        self.progress: Dict[str, int] = {}
+        self.started_at = datetime.utcnow()
+        self.ended_at: Optional[datetime] = None
+        self.done = threading.Event()
+
+    def run(self) -> None:
+        db = SessionLocal()
+        try:
+            self.scanned = scan_workspace(db, self.project_id, parallel=self.parallel, stats=self.progress, git=self.git)
+            self.status = "done"
+        except Exception as exc:
+            db.rollback()
+            self.error = repr(exc)
+            self.status = "failed"
+        finally:
+            db.close()
+            self.ended_at = datetime.utcnow()
+            _finish(self)
+            self.done.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "error": self.error,
+            "scanned": self.scanned,
+            "progress": dict(self.progress),
+            "started_at": self.started_at.isoformat(),
+            "ended_at": self.ended_at.isoformat() if self.ended_at else None,
+        }
+
+
+_lock = threading.Lock()
+_jobs: Dict[str, ScanJob] = {}
+_running: Dict[int, ScanJob] = {}
+
+
+def _finish(job: ScanJob) -> None:
+    with _lock:
+        if _running.get(job.project_id) is job:
+            del _running[job.project_id]
+        finished = [j for j in _jobs.values() if j.done.is_set()]
+        for old in sorted(finished, key=lambda j: j.started_at)[: max(0, len(finished) - _KEEP_FINISHED)]:
+            _jobs.pop(old.id, None)
+
+
+def start_scan_job(project_id: int, parallel: Optional[bool] = None, git: Optional[bool] = None):
+    """启动后台扫描；同一项目已有运行中的任务时直接复用。返回 (job, attached)。"""
+    with _lock:
+        job = _running.get(project_id)
+        if job is not None:
+            return job, True
+        job = ScanJob(project_id, parallel, git)
+        _jobs[job.id] = job
+        _running[project_id] = job
+    threading.Thread(target=job.run, name=f"scan-{project_id}", daemon=True).start()
+    return job, False
+
+
+def get_scan_job(job_id: str) -> Optional[ScanJob]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def iter_job_events(job: ScanJob, interval: float = 0.5):
+    """SSE 事件流：定期推送进度，结束时推送最终状态。"""
+    last = None
+    while True:
+        finished = job.done.wait(interval)
+        payload = json.dumps(job.to_dict(), ensure_ascii=False)
+        if payload != last:
+            yield f"data: {payload}\n\n"
+            last = payload
+        else:
+            yield ": keep-alive\n\n"
+        if finished:
+            yield "event: end\ndata: {}\n\n"
+            return
@@ -0,0 +1,19 @@
+import base64
+import json
+from typing import Any, Optional
+
+
+def encode_cursor(*values: Any) -> str:
+    """键集分页游标：值元组 → URL 安全 base64（对客户端不透明）。"""
+    raw = json.dumps(list(values), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[list]:
+    """解析失败返回 None。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
@@ -0,0 +1,17 @@
+from typing import Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 弱比较（RFC 9110）：支持逗号分隔的多个标签、W/ 前缀与 "*"。"""
+    if not if_none_match:
+        return False
+    strong = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == strong:
+            return True
+    return False
@@ -37,27 +37,36 @@ class Snowflake:
             timestamp = self._time_gen()
         return timestamp
 
-    def get_id(self) -> int:
-        with self.lock:
-            timestamp = self._time_gen()
-            if timestamp < self.last_timestamp:
-                # clock moved backwards, wait
+    def _next_id(self) -> int:
+        # 调用方需持有 self.lock
+        timestamp = self._time_gen()
+        if timestamp < self.last_timestamp:
+            # clock moved backwards, wait
+            timestamp = self._til_next_millis(self.last_timestamp)
+
+        if self.last_timestamp == timestamp:
+            self.sequence = (self.sequence + 1) & self.sequence_mask
+            if self.sequence == 0:
                 timestamp = self._til_next_millis(self.last_timestamp)
+        else:
+            self.sequence = 0
 
-            if self.last_timestamp == timestamp:
-                self.sequence = (self.sequence + 1) & self.sequence_mask
-                if self.sequence == 0:
-                    timestamp = self._til_next_millis(self.last_timestamp)
-            else:
-                self.sequence = 0
+        self.last_timestamp = timestamp
+        return (
+            ((timestamp - self.twepoch) << self.timestamp_left_shift)
+            | (self.datacenter_id << self.datacenter_id_shift)
+            | (self.worker_id << self.worker_id_shift)
+            | self.sequence
+        )
 
-            self.last_timestamp = timestamp
-            return (
-                ((timestamp - self.twepoch) << self.timestamp_left_shift)
-                | (self.datacenter_id << self.datacenter_id_shift)
-                | (self.worker_id << self.worker_id_shift)
-                | self.sequence
-            )
+    def get_id(self) -> int:
+        with self.lock:
+            return self._next_id()
+
+    def get_ids(self, n: int) -> list:
+        """一次加锁批量分配 n 个 id（批量写入时预分配主键）。"""
+        with self.lock:
+            return [self._next_id() for _ in range(n)]
 
 
 _sf = Snowflake()
@@ -67,3 +76,5 @@ def generate_id() -> int:
     return _sf.get_id()
 
 
+def generate_ids(n: int) -> list:
+    return _sf.get_ids(n)
@@ -0,0 +1,63 @@
+"""依赖推断基准：冷缓存下串行与进程池并行提取的耗时对比，并校验两者输出一致。
+
+用法（默认使用临时 SQLite 库，不触碰 MYSQL_URI）：
+    python benchmarks/bench_infer_deps.py 2000 10000
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_TMP = tempfile.mkdtemp(prefix="codebox_bench_")
+os.environ.setdefault("MYSQL_URI", f"sqlite:///{_TMP}/bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.models.file_import import FileImport  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.services.file_scan_service import infer_deps, scan_workspace  # noqa: E402
+from app.services.import_extract_service import shutdown_extract_pool  # noqa: E402
+
+
+def make_tree(root: Path, n_files: int, per_pkg: int = 50) -> None:
+    # 每个模块约 200 行，import 同包与上一个包中的模块
+    body = "".join(f"def f{i}(x):\n    return [y * {i} for y in range(x) if y % 3]\n\n" for i in range(60))
+    for i in range(n_files):
+        pkg = f"pkg{i // per_pkg}"
+        d = root / pkg
+        d.mkdir(parents=True, exist_ok=True)
+        prev = f"pkg{max(0, i // per_pkg - 1)}.m{max(0, i - per_pkg)}"
+        (d / f"m{i}.py").write_text(f"import os\nimport {prev}\nfrom . import m{i - i % per_pkg}\n\n{body}")
+
+
+def run(db, pid, parallel):
+    db.query(FileImport).filter(FileImport.project_id == pid).delete()
+    db.commit()
+    t0 = time.perf_counter()
+    deps = infer_deps(db, pid, parallel=parallel)
+    return time.perf_counter() - t0, deps
+
+
+def main(sizes):
+    Base.metadata.create_all(bind=engine)
+    settings.DEPS_PARALLEL_MIN_FILES = 1
+    print(f"workers={settings.DEPS_WORKERS} chunk={settings.DEPS_CHUNK_SIZE}")
+    print(f"{'files':>8} {'serial s':>9} {'parallel s':>11} {'speedup':>8} {'identical':>10}")
+    for pid, n in enumerate(sizes, start=1):
+        root = Path(_TMP) / f"tree{n}"
+        make_tree(root, n)
+        settings.WORKSPACE_ROOT = str(root)
+        db = SessionLocal()
+        scan_workspace(db, pid, str(root))
+        run(db, pid, True)  # 预热进程池（spawn 启动开销不计入）
+        serial, a = run(db, pid, False)
+        par, b = run(db, pid, True)
+        db.close()
+        print(f"{n:>8} {serial:>9.2f} {par:>11.2f} {serial / par:>7.1f}x {str(a == b):>10}")
+    shutdown_extract_pool()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [2000, 10000])
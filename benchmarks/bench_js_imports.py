@@ -0,0 +1,122 @@
+"""JS/TS import 提取基准：旧的两条正则与 scan_js_imports（全量 / 仅头部）在大体积 bundle 上的吞吐（MB/s）。
+
+用法：
+    python benchmarks/bench_js_imports.py 1 4 16      # 各 bundle 大小（MB）
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.import_extract_service import scan_js_imports  # noqa: E402
+
+# 改造前 infer_deps 使用的正则（对照组）
+_OLD_IMPORT_RE = re.compile(r"^\s*import\s+.*?from\s+['\"](.*?)['\"];?", re.MULTILINE)
+_OLD_REQUIRE_RE = re.compile(r"require\(['\"](.*?)['\"]\)")
+
+
+# 空行用例的绝对上限（字节）
+_BLANK_LINES_MAX = 16 << 10
+
+
+def old_extract(text: str) -> list:
+    return _OLD_IMPORT_RE.findall(text) + _OLD_REQUIRE_RE.findall(text)
+
+
+def make_source(n_bytes: int) -> str:
+    # 普通多行源码：头部 import + 含字符串/模板/正则/注释的函数体
+    head = "".join(f"import {{ a{i}, b{i} }} from './mod{i}';\n" for i in range(40))
+    head += "import './styles.css';\nexport * from './reexport';\n"
+    body = (
+        "export function f{i}(x) {{\n"
+        "  // import fake from './comment'\n"
+        "  const s = \"import x from 'str'\" + `t ${{x}} import y from \"tmpl\"`;\n"
+        "  if (/^import\\s+\\w+/.test(s)) {{ return import('./lazy{i}'); }}\n"
+        "  return x / 2 + s.length;\n"
+        "}}\n"
+    )
+    parts = [head]
+    size, i = len(head), 0
+    while size < n_bytes:
+        chunk = body.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+
+def make_minified(n_bytes: int) -> str:
+    # 压缩 bundle：单行、大量 require、字符串与正则
+    unit = 'var a=require("./m{i}"),b="import x from \'y\'";function c(d){{return/\\d+\\/x/.test(d)?d/2:`${{d}}`}}'
+    parts, size, i = [], 0, 0
+    while size < n_bytes:
+        chunk = unit.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return ";".join(parts)
+
+
+def make_require_head(n_bytes: int) -> str:
+    # CommonJS：require 全在开头，之后是不含关键字的大段代码（预筛只扫描到最后一个关键字）
+    head = "".join(f"const m{i} = require('./mod{i}');\n" for i in range(40))
+    body = (
+        "function g{i}(x) {{\n"
+        "  // helper\n"
+        "  const s = \"str\" + `t ${{x}}`;\n"
+        "  return /^\\d+/.test(s) ? x / 2 : s.length;\n"
+        "}}\n"
+    )
+    parts = [head]
+    size, i = len(head), 0
+    while size < n_bytes:
+        chunk = body.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+
+def make_blank_lines(n_bytes: int) -> str:
+    # 大段空行：旧正则中可跨行的 ^\s* 在每个行首重复扫描后续空白，耗时随空行数平方增长
+    return "import a from './a'\n" + "\n" * n_bytes
+
+
+def bench(fn, text: str, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best, len(out)
+
+
+def main(sizes_mb):
+    cases = [
+        ("source", make_source),
+        ("minified", make_minified),
+        ("require-head", make_require_head),
+        ("blank-lines", make_blank_lines),
+    ]
+    print(f"{'case':>12} {'MB':>5} {'old MB/s':>9} {'lexer MB/s':>11} {'header MB/s':>12} {'old n':>7} {'lexer n':>8} {'header n':>9}")
+    for name, make in cases:
+        for mb in sizes_mb:
+            n = int(mb * (1 << 20))
+            if name == "blank-lines":
+                # 空行用例对旧正则是平方复杂度（16KB 单次约 0.7s，翻倍约慢 4 倍），固定上限以免跑太久
+                n = min(n, _BLANK_LINES_MAX)
+            text = make(n)
+            size = len(text.encode()) / (1 << 20)
+            t_old, n_old = bench(old_extract, text)
+            t_lex, n_lex = bench(scan_js_imports, text)
+            t_hdr, n_hdr = bench(lambda t: scan_js_imports(t, header_only=True), text)
+            print(
+                f"{name:>12} {size:>5.2f} {size / t_old:>9.1f} {size / t_lex:>11.1f} "
+                f"{size / t_hdr:>12.1f} {n_old:>7} {n_lex:>8} {n_hdr:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main([float(a) for a in sys.argv[1:]] or [1, 4, 16])
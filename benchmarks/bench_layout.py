@@ -0,0 +1,78 @@
+"""六边形布局基准：layered_layout 在模块化随机有向图（含环、孤立与锁定节点）上的耗时与边的平均水平跨度，
+以及在已有布局上用 incremental_layout 增量放置 1% 新节点的耗时。
+
+用法：
+    python benchmarks/bench_layout.py 10000:50000 2000:8000     # 节点数:边数
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.layout_hex_service import incremental_layout, layered_layout  # noqa: E402
+
+
+def make_graph(n_nodes: int, n_edges: int, levels: int = 12, cluster: int = 50, seed: int = 7):
+    # 节点分成若干模块（每模块约 cluster 个），模块内节点随机分到层级；90% 的边在模块内从低层级指向高一到两级，
+    # 约 2% 反向边形成环，约 5% 节点无边；节点编号打乱，初始顺序不含模块信息
+    rnd = random.Random(seed)
+    ids = [10_000_000 + i for i in range(n_nodes)]
+    rnd.shuffle(ids)
+    linked = int(n_nodes * 0.95)
+    n_clusters = max(1, linked // cluster)
+    grid = [[[] for _ in range(levels)] for _ in range(n_clusters)]
+    for i in range(linked):
+        grid[i % n_clusters][rnd.randrange(levels)].append(ids[i])
+    edges = []
+    while len(edges) < n_edges:
+        ca = rnd.randrange(n_clusters)
+        cb = ca if rnd.random() < 0.9 else rnd.randrange(n_clusters)
+        la = rnd.randrange(levels - 1)
+        lb = min(levels - 1, la + 1 + (rnd.random() < 0.3))
+        if not grid[ca][la] or not grid[cb][lb]:
+            continue
+        a, b = rnd.choice(grid[ca][la]), rnd.choice(grid[cb][lb])
+        if rnd.random() < 0.02:
+            a, b = b, a
+        edges.append((a, b))
+    # 若干锁定节点
+    locked = {ids[i]: (i, 0) for i in range(0, n_nodes, max(1, n_nodes // 20))}
+    return ids, edges, locked
+
+
+def mean_edge_span(pos, edges) -> float:
+    """边两端的平均水平距离（pointy-top 轴坐标的 x = q + r/2）；交叉越少、同模块越聚拢，该值越小。"""
+    total = 0.0
+    for a, b in edges:
+        (qa, ra), (qb, rb) = pos[a], pos[b]
+        total += abs((qa + ra / 2) - (qb + rb / 2))
+    return total / max(1, len(edges))
+
+
+def main(specs):
+    print(f"{'nodes':>7} {'edges':>7} {'sweeps':>7} {'seconds':>8} {'rows':>5} {'mean span':>10}")
+    for n, m in specs:
+        ids, edges, locked = make_graph(n, m)
+        for sweeps in (0, 4):
+            t0 = time.perf_counter()
+            pos = layered_layout(ids, edges, locked, sweeps=sweeps)
+            dt = time.perf_counter() - t0
+            assert len(set(pos.values())) == len(pos) == n
+            assert all(pos[f] == c for f, c in locked.items())
+            rows = len({r for _, r in pos.values()})
+            print(f"{n:>7} {m:>7} {sweeps:>7} {dt:>8.3f} {rows:>5} {mean_edge_span(pos, edges):>10.2f}")
+        # 增量：已有布局上新增 1% 的节点，只放置这些节点
+        new = set(ids[-max(1, n // 100):])
+        placed = {f: c for f, c in pos.items() if f not in new or f in locked}
+        t0 = time.perf_counter()
+        out = incremental_layout(edges, placed, [f for f in new if f not in placed])
+        dt = time.perf_counter() - t0
+        assert not set(out.values()) & set(placed.values())
+        print(f"{n:>7} {m:>7} {'+' + str(len(out)):>7} {dt:>8.3f}")
+
+
+if __name__ == "__main__":
+    args = [tuple(int(x) for x in a.split(":")) for a in sys.argv[1:]]
+    main(args or [(10000, 50000)])
@@ -0,0 +1,64 @@
+"""扫描峰值内存基准：重扫描（索引已存在）时 tracemalloc 峰值应与项目规模无关。
+
+用法（默认使用临时 SQLite 库，不触碰 MYSQL_URI）：
+    python benchmarks/bench_scan_memory.py 10000 50000 100000
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+_TMP = tempfile.mkdtemp(prefix="codebox_bench_")
+os.environ.setdefault("MYSQL_URI", f"sqlite:///{_TMP}/bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.base import Base  # noqa: E402
+from app.db.models.file import File  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.services.file_scan_service import scan_workspace  # noqa: E402
+
+
+def make_tree(root: Path, n_files: int, per_dir: int = 100) -> None:
+    for i in range(n_files):
+        d = root / f"d{i // (per_dir * per_dir)}" / f"s{(i // per_dir) % per_dir}"
+        d.mkdir(parents=True, exist_ok=True)
+        (d / f"f{i}.py").write_text("x = 1\n")
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main(sizes):
+    Base.metadata.create_all(bind=engine)
+    print(f"{'files':>8} {'rescan peak':>12} {'full-load peak':>15} {'rescan s':>9}")
+    for pid, n in enumerate(sizes, start=1):
+        root = Path(_TMP) / f"tree{n}"
+        make_tree(root, n)
+        db = SessionLocal()
+        scan_workspace(db, pid, str(root))
+        db.close()
+
+        db = SessionLocal()
+        peak, elapsed = measure(lambda: scan_workspace(db, pid, str(root)))
+        db.close()
+
+        # 对照：旧实现在扫描前把全部 File ORM 行装入 existing 字典
+        db = SessionLocal()
+        full_peak, _ = measure(
+            lambda: {(r.path, int(r.is_dir)): r for r in db.query(File).filter(File.project_id == pid).all()}
+        )
+        db.close()
+        print(f"{n:>8} {peak / 2**20:>10.1f}MB {full_peak / 2**20:>13.1f}MB {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [5000, 20000, 50000])
@@ -0,0 +1,28 @@
+"""一次性迁移：由 feature_details.files_json 回填 feature_files（升级到带 feature_files 的版本后执行一次）。
+
+只补“有 files_json 但没有 feature_files 行”的功能，可重复执行。
+用法（使用 .env / MYSQL_URI 指向的库）：
+    python scripts/backfill_feature_files.py            # 全部项目
+    python scripts/backfill_feature_files.py 123 456    # 指定项目
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.services.feature_file_service import backfill_feature_files  # noqa: E402
+
+
+def main(argv) -> None:
+    db = SessionLocal()
+    try:
+        for pid in [int(x) for x in argv] or [None]:
+            n = backfill_feature_files(db, pid)
+            print(f"project={pid if pid is not None else 'all'} rows={n}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+os.environ.setdefault("MYSQL_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "codebox_test.db"))
+
+import pytest
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+import app.db.models  # noqa: F401
+from app.db.models.project import Project
+from app.services.file_edge_service import current_generation, load_edges
+from app.services.file_graph_service import get_file_graph
+from app.services.file_scan_service import infer_deps, iter_infer_deps, scan_workspace
+
+
+@pytest.fixture()
+def workspace(tmp_path, monkeypatch):
+    (tmp_path / "a.ts").write_text("export const a = 1\n")
+    (tmp_path / "b.ts").write_text("import { a } from './a'\n")
+    (tmp_path / "c.ts").write_text("import { b } from './b'\n")
+    monkeypatch.setattr(settings, "WORKSPACE_ROOT", str(tmp_path))
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return tmp_path
+
+
+@pytest.mark.parametrize("with_project_row", [True, False])
+def test_delete_only_reinfer_refreshes_graph(workspace, with_project_row):
+    project_id = 101 if with_project_row else 102
+    db = SessionLocal()
+    try:
+        if with_project_row:
+            db.add(Project(id=project_id, create_user_id=0, is_deleted=0, name=f"p{project_id}"))
+            db.commit()
+        scan_workspace(db, project_id, str(workspace))
+        infer_deps(db, project_id)
+        first = current_generation(db, project_id)
+        assert [i["path"] for i in get_file_graph(db, project_id).closure("b.ts", reverse=True)] == ["c.ts"]
+
+        # 只删除边的一轮：不写入任何新行
+        (workspace / "c.ts").write_text("export const c = 3\n")
+        stats: dict = {}
+        infer_deps(db, project_id, stats=stats)
+        assert stats["sources_replaced"] == 1 and stats["edges_written"] == 0
+        assert load_edges(db, project_id, src=["c.ts"]) == []
+        if with_project_row:
+            assert current_generation(db, project_id) == stats["generation"] > first
+        assert get_file_graph(db, project_id).closure("b.ts", reverse=True) == []
+    finally:
+        db.close()
+
+
+def test_graph_queried_between_batches_sees_later_batches(workspace, monkeypatch):
+    project_id = 103
+    (workspace / "c.ts").write_text("import { a } from './a'\n")
+    monkeypatch.setattr(settings, "SCAN_BATCH_SIZE", 1)
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, create_user_id=0, is_deleted=0, name=f"p{project_id}"))
+        db.commit()
+        scan_workspace(db, project_id, str(workspace))
+        assert get_file_graph(db, project_id).edge_count == 0
+
+        # 每批单独提交且共用一个 generation：第一批之后查询一次，之后的批次仍须并入
+        queried = False
+        for _ in iter_infer_deps(db, project_id):
+            if not queried:
+                get_file_graph(db, project_id)
+                queried = True
+        assert queried
+        dependents = sorted(i["path"] for i in get_file_graph(db, project_id).closure("a.ts", reverse=True))
+        assert dependents == ["b.ts", "c.ts"]
+    finally:
+        db.close()